@@ -1,12 +1,25 @@
+import ast
+import asyncio
 import os
 import re
-from typing import Optional
+from typing import Dict, List, Optional, Tuple, Union
 import report_generator
 import llm_interface
 import validator
 import utils
 from chunker import CodeChunker
 
+# Fenced code block patterns used to pull code out of LLM responses
+_PYTHON_FENCE_RE = re.compile(r"```python\s*(.*?)```", re.DOTALL)
+_ANY_FENCE_RE = re.compile(r"```\s*(.*?)```", re.DOTALL)
+
+# Refusals/placeholders are detected on the first few characters only, so a
+# large response is never lowercased in full
+_APOLOGY_PREFIXES = ("i'm sorry", "im sorry", "sorry", "i cannot", "i can't")
+_PLACEHOLDER_MARKER = "# upgraded code here"
+_PREFIX_CHECK_LEN = 32
+
+
 def upgrade_file(input_path: str, output_path: str) -> report_generator.FileUpgradeResult:
     """Upgrade a single file with hybrid strategy and detailed tracking"""
     
@@ -33,15 +46,15 @@ def upgrade_file(input_path: str, output_path: str) -> report_generator.FileUpgr
         )
     
     old_code = utils.read_file(input_path)
-    line_count = len(old_code.split('\n'))
+    line_count = old_code.count('\n') + 1
     
-    # Pre-validation check
+    # Pre-validation check: parse once and reuse the tree for chunking. A file that
+    # does not parse still goes to the LLM; chunking then falls back to its own parse.
+    tree = None
     try:
-        precheck_valid, precheck_error = validator.validate_code(input_path)
-        if not precheck_valid:
-            print(f"Pre-check failed for {input_path}: {precheck_error}")
-    except Exception as exc:
-        precheck_error = str(exc)
+        tree = ast.parse(old_code)
+    except Exception as exc:  # SyntaxError, or e.g. MemoryError/RecursionError on pathological input
+        print(f"Pre-check failed for {input_path}: {type(exc).__name__}: {exc}")
     
     # HYBRID DECISION LOGIC
     if line_count < 1000:
@@ -57,14 +70,14 @@ def upgrade_file(input_path: str, output_path: str) -> report_generator.FileUpgr
         if not result.success and result.error and ("token" in result.error.lower() or "context_length" in result.error.lower()):
             # Token limit hit - retry with chunking
             print(f"Token limit detected, retrying with chunking...")
-            return _upgrade_chunked(input_path, output_path, old_code)
+            return _upgrade_chunked(input_path, output_path, old_code, tree)
         
         return result
     
     else:
         # Large file - must chunk from start
         print(f"Large file ({line_count} lines) - using chunked approach")
-        return _upgrade_chunked(input_path, output_path, old_code)
+        return _upgrade_chunked(input_path, output_path, old_code, tree)
 
 
 def _upgrade_standard(input_path: str, output_path: str, old_code: str, MAX_RETRIES: int) -> report_generator.FileUpgradeResult:
@@ -84,8 +97,8 @@ def _upgrade_standard(input_path: str, output_path: str, old_code: str, MAX_RETR
                 print(f"{input_path} attempt {attempt} error: {error}")
                 continue
 
-            apology_prefixes = ("i'm sorry", "im sorry", "sorry", "i cannot", "i can't")
-            if stripped_code.lower().startswith(apology_prefixes) or stripped_code.startswith("# upgraded code here"):
+            head = stripped_code[:_PREFIX_CHECK_LEN]
+            if head.lower().startswith(_APOLOGY_PREFIXES) or head.startswith(_PLACEHOLDER_MARKER):
                 error = "LLM returned placeholder text instead of upgraded code"
                 print(f"{input_path} attempt {attempt} error: {error}")
                 continue
@@ -93,9 +106,11 @@ def _upgrade_standard(input_path: str, output_path: str, old_code: str, MAX_RETR
             utils.write_file(output_path, new_code)
             
             # Validate the new code
-            is_valid, error = validator.validate_code(output_path)
+            is_valid, error = validator.validate_code(output_path, source=new_code)
             
             if is_valid:
+                llm_interface.cache_response(prompt, response)
+                
                 # Success! Generate final result
                 api_changes = utils.extract_api_changes(old_code, new_code)
                 diff = utils.generate_diff(old_code, new_code, os.path.basename(input_path))
@@ -141,76 +156,30 @@ def _upgrade_standard(input_path: str, output_path: str, old_code: str, MAX_RETR
     )
 
 
-def _upgrade_chunked(input_path: str, output_path: str, old_code: str) -> report_generator.FileUpgradeResult:
+def _upgrade_chunked(input_path: str, output_path: str, old_code: str, tree: Optional[ast.AST] = None) -> report_generator.FileUpgradeResult:
     """Chunked upgrade for large files"""
     
     MAX_RETRIES = int(os.getenv("ML_UPGRADER_MAX_RETRIES_CHUNK", "3"))  # Fewer retries per chunk
     
     chunker = CodeChunker(max_lines=300)
-    chunks = chunker.chunk_by_functions(old_code, input_path)
+    chunks = chunker.chunk_by_functions(old_code, input_path, tree=tree)
     
     print(f" Split into {len(chunks)} chunks")
     
+    parallelism = max(1, int(os.getenv("ML_UPGRADER_PARALLELISM", "8")))
+    chunk_results = asyncio.run(_upgrade_chunks_concurrently(chunks, MAX_RETRIES, parallelism))
+    
     upgraded_chunks = []
     all_api_changes = []
     total_attempts = 0
     failed_chunks = []
     
-    for i, chunk in enumerate(chunks):
-        chunk_name = chunk.get('name', f"chunk-{i}")
-        chunk_type = chunk.get('type', 'unknown')
-        print(f"  [{i+1}/{len(chunks)}] Upgrading {chunk_type} '{chunk_name}'...")
-        
-        # Prepare chunk with imports for context
-        chunk_code = chunk['imports'] + '\n\n' + chunk['code'] if chunk['imports'] else chunk['code']
-        error = None
-        
-        chunk_upgraded = False
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                prompt = utils.build_prompt(chunk_code, error)
-                response = llm_interface.call_llm(prompt)
-                upgraded = clean_llm_response(response)
-                
-                if not upgraded.strip():
-                    error = "Empty response"
-                    continue
-                
-                apology_prefixes = ("i'm sorry", "im sorry", "sorry", "i cannot", "i can't")
-                if upgraded.strip().lower().startswith(apology_prefixes):
-                    error = "LLM returned placeholder text"
-                    continue
-                
-                # Quick syntax validation
-                is_valid, error = validator.validate_syntax(upgraded)
-                
-                if is_valid:
-                    # Remove imports from upgraded chunk (we'll add them back at reassembly)
-                    if chunk['imports']:
-                        upgraded_no_imports = upgraded.replace(chunk['imports'], '').strip()
-                        upgraded_chunks.append(upgraded_no_imports)
-                    else:
-                        upgraded_chunks.append(upgraded)
-                    
-                    # Track API changes
-                    chunk_changes = utils.extract_api_changes(chunk['code'], upgraded)
-                    all_api_changes.extend(chunk_changes)
-                    
-                    total_attempts += attempt
-                    chunk_upgraded = True
-                    print(f"{chunk_name} upgraded in {attempt} attempt(s)")
-                    break
-                    
-            except Exception as e:
-                error = str(e)
-                print(f"    ⚠️ {chunk_name} attempt {attempt} error: {error}")
-        
+    for i, (upgraded, chunk_changes, attempts, chunk_upgraded) in enumerate(chunk_results):
+        upgraded_chunks.append(upgraded)
+        all_api_changes.extend(chunk_changes)
+        total_attempts += attempts
         if not chunk_upgraded:
-            # Fallback: keep original chunk
-            print(f"{chunk_name} failed after {MAX_RETRIES} attempts, keeping original")
-            upgraded_chunks.append(chunk['code'])
-            failed_chunks.append(chunk_name)
-            total_attempts += MAX_RETRIES
+            failed_chunks.append(chunks[i].get('name', f"chunk-{i}"))
     
     # Reassemble file: imports at top, then all chunks
     first_chunk = chunks[0]
@@ -220,9 +189,8 @@ def _upgrade_chunked(input_path: str, output_path: str, old_code: str) -> report
         final_parts.append(first_chunk['imports'])
     
     final_parts.extend(upgraded_chunks)
-    final_code = '\n\n'.join(final_parts)
-    
-    utils.write_file(output_path, final_code)
+    # Stream parts to disk; the joined string is only built below if a diff is needed
+    utils.write_parts(output_path, final_parts, '\n\n')
     
     # Overall validation
     is_valid, final_error = validator.validate_code(output_path)
@@ -239,25 +207,153 @@ def _upgrade_chunked(input_path: str, output_path: str, old_code: str) -> report
     
     print(f" Chunk upgrade complete: {len(chunks) - len(failed_chunks)}/{len(chunks)} successful")
     
+    diff = None
+    if success:
+        diff = utils.generate_diff(old_code, '\n\n'.join(final_parts), os.path.basename(input_path))
+    
     return report_generator.FileUpgradeResult(
         file_path=input_path,
         success=success,
         attempts=total_attempts,
         api_changes=all_api_changes,
         error=result_error,
-        diff=utils.generate_diff(old_code, final_code, os.path.basename(input_path)) if success else None
+        diff=diff
     )
 
 
+async def _upgrade_chunks_concurrently(chunks: List[Dict], MAX_RETRIES: int, parallelism: int) -> List[Tuple[str, List[str], int, bool]]:
+    """Upgrade all chunks concurrently, at most `parallelism` LLM calls in flight"""
+    sem = asyncio.Semaphore(parallelism)
+    total = len(chunks)
+    
+    # First attempt for every chunk goes out as one batch over a shared client;
+    # only chunks whose response fails validation fall back to individual retries
+    first_prompts = [utils.build_prompt(_chunk_with_imports(chunk)) for chunk in chunks]
+    
+    # One client for the batch and every retry, so they all share its connection pool
+    try:
+        client = llm_interface.make_async_client()
+    except Exception:  # e.g. no API key: the calls below make their own and report it per chunk
+        client = None
+    
+    try:
+        first_responses = await llm_interface.acall_llm_batch(first_prompts, concurrency=parallelism, client=client)
+        
+        async def _upgrade_one_chunk(i: int, chunk: Dict) -> Tuple[str, List[str], int, bool]:
+            async with sem:
+                return await _upgrade_chunk(i, total, chunk, MAX_RETRIES, first_responses[i], client)
+        
+        # gather preserves input order, so results line up with chunks for reassembly
+        return await asyncio.gather(*[_upgrade_one_chunk(i, c) for i, c in enumerate(chunks)])
+    finally:
+        if client is not None:
+            await client.close()
+
+
+def _chunk_with_imports(chunk: Dict) -> str:
+    """Prepare chunk with imports for context"""
+    return chunk['imports'] + '\n\n' + chunk['code'] if chunk['imports'] else chunk['code']
+
+
+async def _upgrade_chunk(
+    i: int,
+    total: int,
+    chunk: Dict,
+    MAX_RETRIES: int,
+    first_response: Union[str, BaseException, None] = None,
+    client=None,
+) -> Tuple[str, List[str], int, bool]:
+    """Retry loop for a single chunk; returns (code, api_changes, attempts, success)"""
+    chunk_name = chunk.get('name', f"chunk-{i}")
+    chunk_type = chunk.get('type', 'unknown')
+    print(f"  [{i+1}/{total}] Upgrading {chunk_type} '{chunk_name}'...")
+    
+    chunk_code = _chunk_with_imports(chunk)
+    error = None
+    
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            # On attempt 1 (error is None) this is the prompt the batched first pass sent
+            prompt = utils.build_prompt(chunk_code, error)
+            if attempt == 1 and first_response is not None:
+                # Response already fetched by the batched first pass
+                if isinstance(first_response, BaseException):
+                    raise first_response
+                response = first_response
+            else:
+                response = await llm_interface.acall_llm(prompt, client=client)
+            upgraded = clean_llm_response(response)
+            
+            head = upgraded.lstrip()[:_PREFIX_CHECK_LEN]
+            if not head:
+                error = "Empty response"
+                continue
+            
+            if head.lower().startswith(_APOLOGY_PREFIXES):
+                error = "LLM returned placeholder text"
+                continue
+            
+            # Quick syntax validation
+            is_valid, error = validator.validate_syntax(upgraded)
+            
+            if is_valid:
+                llm_interface.cache_response(prompt, response)
+                
+                # Remove imports from upgraded chunk (we'll add them back at reassembly)
+                if chunk['imports']:
+                    upgraded = _strip_leading_imports(upgraded, chunk['imports'])
+                
+                # Track API changes
+                chunk_changes = utils.extract_api_changes(chunk['code'], upgraded)
+                
+                print(f"{chunk_name} upgraded in {attempt} attempt(s)")
+                return upgraded, chunk_changes, attempt, True
+                
+        except Exception as e:
+            error = str(e)
+            print(f"    ⚠️ {chunk_name} attempt {attempt} error: {error}")
+    
+    # Fallback: keep original chunk
+    print(f"{chunk_name} failed after {MAX_RETRIES} attempts, keeping original")
+    return chunk['code'], [], MAX_RETRIES, False
+
+
+def _strip_leading_imports(code: str, imports: str) -> str:
+    """Drop the import header we prepended to a chunk, if the LLM kept it at the top"""
+    stripped = code.lstrip()
+    if stripped.startswith(imports):
+        return stripped[len(imports):].strip()
+    
+    # The LLM reordered or reformatted the header: drop the leading import statements
+    # we sent, keeping any it added (reassembly only restores the original header)
+    try:
+        header = {ast.dump(node) for node in ast.parse(imports).body}
+        body = ast.parse(stripped).body
+    except Exception:
+        return stripped.strip()
+    
+    lines = stripped.splitlines(keepends=True)
+    kept = []
+    end = 0
+    for node in body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        if ast.dump(node) not in header:
+            kept.append(''.join(lines[node.lineno - 1:node.end_lineno]))
+        end = node.end_lineno
+    rest = ''.join(lines[end:]).strip()
+    return ''.join(kept).strip() + '\n\n' + rest if kept else rest
+
+
 def clean_llm_response(response: str) -> str:
     """Extract the upgraded Python code from LLM response (strip markdown, explanations)"""
     # Extract text inside the first ```python ... ```
-    match = re.search(r"```python\s*(.*?)```", response, re.DOTALL)
+    match = _PYTHON_FENCE_RE.search(response)
     if match:
         return match.group(1).strip()
     
     # Fallback: try just ``` ... ```
-    match = re.search(r"```\s*(.*?)```", response, re.DOTALL)
+    match = _ANY_FENCE_RE.search(response)
     if match:
         return match.group(1).strip()
     
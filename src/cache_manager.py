@@ -1,9 +1,54 @@
 import os
 import json
+import atexit
 import hashlib
+import mmap
+import shutil
+import threading
+import weakref
 from typing import Optional, Dict, Any
 from datetime import datetime
 
+try:  # Optional: much faster (de)serialization of large caches
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _dumps(data: Any) -> bytes:
+    """Serialize cache data compactly, via orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    """Parse cache data, via orjson when available"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Bump when the cache entry format or hash algorithm changes so stale entries are dropped
+CACHE_VERSION = 2
+HASH_ALGORITHM = "sha256"
+
+# Files at least this large are hashed straight from a read-only memory map
+MMAP_THRESHOLD = 1 << 20
+
+# Persist after this many cache_result calls; the remainder is written by flush()/atexit
+DEFAULT_FLUSH_EVERY = 25
+
+# Live managers, flushed by one exit hook; weak so a finished upgrade's manager
+# (and its cache_data) is freed instead of being pinned until the process exits
+_live_managers: "weakref.WeakSet[CacheManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_live_managers() -> None:
+    for manager in list(_live_managers):
+        manager.flush()
+
+
 class CacheManager:
     """Manage upgrade cache and resume capability"""
     
@@ -12,95 +57,183 @@ class CacheManager:
         self.cache_dir = os.path.join(repo_path, ".ml_upgrader_cache")
         self.cache_file = os.path.join(self.cache_dir, "upgrade_cache.json")
         self.cache_data = self._load_cache()
+        # file_path -> repo-relative key; each file is looked up several times per run
+        self._rel_cache: Dict[str, str] = {}
+        # Files are upgraded from worker threads; serialize cache mutation + persistence
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._writes_since_flush = 0
+        self.flush_every = max(1, int(os.getenv("ML_UPGRADER_CACHE_FLUSH_EVERY", str(DEFAULT_FLUSH_EVERY))))
+        _live_managers.add(self)
     
     def _load_cache(self) -> Dict:
         """Load existing cache or create new"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Could not load cache: {e}")
-                return {"files": {}, "metadata": {}}
-        return {"files": {}, "metadata": {}}
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = _loads(f.read())
+        except FileNotFoundError:
+            return self._empty_cache()
+        except Exception as e:
+            print(f"Could not load cache: {e}")
+            return self._empty_cache()
+        if data.get("metadata", {}).get("version") != CACHE_VERSION:
+            print("Cache format changed, discarding old entries")
+            return self._empty_cache()
+        return data
+    
+    def _empty_cache(self) -> Dict:
+        return {"files": {}, "metadata": {"version": CACHE_VERSION, "hash": HASH_ALGORITHM}}
     
     def _save_cache(self):
-        """Persist cache to disk"""
+        """Persist cache to disk (caller holds the lock)"""
         os.makedirs(self.cache_dir, exist_ok=True)
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache_data, f, indent=2)
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(_dumps(self.cache_data))
+        os.replace(tmp_file, self.cache_file)
+        self._dirty = False
+        self._writes_since_flush = 0
+    
+    def flush(self):
+        """Write any pending cache updates to disk"""
+        with self._lock:
+            if self._dirty:
+                self._save_cache()
     
     def _get_file_hash(self, file_path: str) -> str:
-        """Get MD5 hash of file content"""
+        """Get SHA-256 hash of file content, streamed so large files aren't slurped"""
         try:
             with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                if os.fstat(f.fileno()).st_size >= MMAP_THRESHOLD:
+                    # Hash the page cache directly; no read buffers are copied
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        return hashlib.new(HASH_ALGORITHM, mm).hexdigest()
+                if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                    return hashlib.file_digest(f, HASH_ALGORITHM).hexdigest()
+                hasher = hashlib.new(HASH_ALGORITHM)
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    hasher.update(chunk)
+                return hasher.hexdigest()
         except Exception:
             return ""
     
-    def is_file_cached(self, file_path: str) -> bool:
-        """Check if file was already successfully upgraded"""
-        rel_path = os.path.relpath(file_path, self.repo_path)
-        
-        if rel_path not in self.cache_data["files"]:
-            return False
-        
-        cached_entry = self.cache_data["files"][rel_path]
+    def _get_file_stat(self, file_path: str) -> Optional[list]:
+        """Get [size, mtime_ns] used to skip rehashing unchanged files"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+    
+    def _rel_path(self, file_path: str) -> str:
+        """Repo-relative cache key for file_path, computed once per path"""
+        rel_path = self._rel_cache.get(file_path)
+        if rel_path is None:
+            rel_path = self._rel_cache.setdefault(file_path, os.path.relpath(file_path, self.repo_path))
+        return rel_path
+    
+    def _valid_entry(self, file_path: str) -> Optional[Dict]:
+        """Cache entry of file_path if it is unchanged since a successful upgrade, else None"""
+        rel_path = self._rel_path(file_path)
         
-        # Check if file hasn't changed since cache
-        current_hash = self._get_file_hash(file_path)
-        cached_hash = cached_entry.get("input_hash", "")
+        cached_entry = self.cache_data["files"].get(rel_path)
+        if cached_entry is None:
+            return None
         
-        if current_hash != cached_hash:
-            print(f"{rel_path} changed since cache, re-upgrading")
-            return False
+        # Check if file hasn't changed since cache; identical size + mtime skips the rehash
+        current_stat = self._get_file_stat(file_path)
+        if current_stat is None or current_stat != cached_entry.get("stat"):
+            current_hash = self._get_file_hash(file_path)
+            cached_hash = cached_entry.get("input_hash", "")
+            
+            if current_hash != cached_hash:
+                print(f"{rel_path} changed since cache, re-upgrading")
+                return None
         
         # Check if upgrade was successful
         if not cached_entry.get("success", False):
-            return False
+            return None
         
-        return True
+        return cached_entry
     
-    def cache_result(self, file_path: str, result: Any, upgraded_code: Optional[str] = None):
-        """Cache upgrade result for a file"""
-        rel_path = os.path.relpath(file_path, self.repo_path)
+    def is_file_cached(self, file_path: str) -> bool:
+        """Check if file was already successfully upgraded"""
+        return self._valid_entry(file_path) is not None
+    
+    def try_restore(self, file_path: str, output_path: str) -> Optional[Dict]:
+        """Restore a cached upgrade of file_path into output_path with a single lookup
+
+        Combines is_file_cached, restore_from_cache and get_cached_result:
+        returns the cache entry on success, None if the file needs upgrading.
+        """
+        cached_entry = self._valid_entry(file_path)
+        if cached_entry is None or not self._restore_entry(file_path, cached_entry, output_path):
+            return None
+        return cached_entry
+    
+    def cache_result(self, file_path: str, result: Any, upgraded_code: Optional[str] = None,
+                     upgraded_path: Optional[str] = None):
+        """Cache upgrade result for a file
+
+        The upgraded code is given either as text or, cheaper, as the path of
+        the file holding it, which is copied without reading it into Python.
+        """
+        rel_path = self._rel_path(file_path)
         
-        self.cache_data["files"][rel_path] = {
+        entry = {
             "success": result.success,
             "attempts": result.attempts,
             "timestamp": datetime.now().isoformat(),
             "input_hash": self._get_file_hash(file_path),
+            "stat": self._get_file_stat(file_path),
             "error": result.error,
             "api_changes": result.api_changes
         }
         
         # Save upgraded code to cache for quick restore
-        if upgraded_code and result.success:
+        if (upgraded_code or upgraded_path) and result.success:
             code_cache_path = os.path.join(self.cache_dir, "upgraded", rel_path)
             os.makedirs(os.path.dirname(code_cache_path), exist_ok=True)
-            with open(code_cache_path, 'w') as f:
-                f.write(upgraded_code)
-            self.cache_data["files"][rel_path]["cached_output"] = code_cache_path
+            if upgraded_path:
+                shutil.copyfile(upgraded_path, code_cache_path)  # kernel-side copy where supported
+            else:
+                with open(code_cache_path, 'w') as f:
+                    f.write(upgraded_code)
+            entry["cached_output"] = code_cache_path
         
-        self._save_cache()
+        with self._lock:
+            self.cache_data["files"][rel_path] = entry
+            self._dirty = True
+            self._writes_since_flush += 1
+            if self._writes_since_flush >= self.flush_every:
+                self._save_cache()
     
     def restore_from_cache(self, file_path: str, output_path: str) -> bool:
         """Restore upgraded file from cache"""
-        rel_path = os.path.relpath(file_path, self.repo_path)
-        
-        if rel_path not in self.cache_data["files"]:
+        cached_entry = self.cache_data["files"].get(self._rel_path(file_path))
+        if cached_entry is None:
             return False
-        
-        cached_entry = self.cache_data["files"][rel_path]
+        return self._restore_entry(file_path, cached_entry, output_path)
+    
+    def _restore_entry(self, file_path: str, cached_entry: Dict, output_path: str) -> bool:
+        """Copy the cached output of cached_entry to output_path"""
+        rel_path = self._rel_path(file_path)
         cached_output = cached_entry.get("cached_output")
         
-        if not cached_output or not os.path.exists(cached_output):
+        if not cached_output:
             return False
         
         try:
-            with open(cached_output, 'r') as f:
+            with open(cached_output, 'rb') as f:
                 content = f.read()
-            with open(output_path, 'w') as f:
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"  ⚠️ Failed to restore from cache: {e}")
+            return False
+        
+        try:
+            with open(output_path, 'wb') as f:
                 f.write(content)
             print(f"Restored {rel_path} from cache")
             return True
@@ -110,15 +243,19 @@ class CacheManager:
     
     def get_cached_result(self, file_path: str) -> Optional[Dict]:
         """Get cached result for a file"""
-        rel_path = os.path.relpath(file_path, self.repo_path)
+        rel_path = self._rel_path(file_path)
         return self.cache_data["files"].get(rel_path)
     
     def clear_cache(self):
         """Clear all cache data"""
-        if os.path.exists(self.cache_dir):
-            import shutil
+        try:
             shutil.rmtree(self.cache_dir)
-        self.cache_data = {"files": {}, "metadata": {}}
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self.cache_data = self._empty_cache()
+            self._dirty = False
+            self._writes_since_flush = 0
         print("Cache cleared")
     
     def get_stats(self) -> Dict:
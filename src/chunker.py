@@ -1,53 +1,110 @@
 import ast
-from typing import List, Dict
+import functools
+import os
+from typing import Iterator, List, Dict, Optional, Tuple
+
+try:  # Optional: exact token counts when tiktoken is installed
+    import tiktoken  # type: ignore
+except ImportError:  # pragma: no cover
+    tiktoken = None
+
+# Completions are capped at 2000 tokens and must echo the whole chunk back,
+# so keep each chunk's input at ~80% of that
+DEFAULT_MAX_TOKENS = 1600
+DEFAULT_TOKEN_MODEL = "openai/gpt-4o-mini"
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoder(model: str):
+    """Resolve (once per model) the tiktoken encoding, or None to fall back to estimation"""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model.split('/')[-1])
+    except KeyError:
+        pass
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:  # encoding files unavailable (e.g. offline)
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens for the configured model (~4 chars/token estimate without tiktoken)"""
+    encoder = _get_encoder(model or os.getenv("ML_UPGRADER_MODEL", DEFAULT_TOKEN_MODEL))
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text, disallowed_special=()))
+
 
 class CodeChunker:
     """Intelligently split large Python files into manageable chunks"""
-    
-    def __init__(self, max_lines: int = 300):
+
+    def __init__(self, max_lines: int = 300, max_tokens: Optional[int] = None):
         self.max_lines = max_lines
-    
-    def chunk_by_functions(self, code: str, filepath: str) -> List[Dict]:
+        if max_tokens is None:
+            max_tokens = int(os.getenv("ML_UPGRADER_CHUNK_MAX_TOKENS", str(DEFAULT_MAX_TOKENS)))
+        self.max_tokens = max(1, max_tokens)
+
+    def chunk_by_functions(self, code: str, filepath: str, tree: Optional[ast.AST] = None) -> List[Dict]:
         """
         Split code into chunks by top-level functions/classes
-        
+
+        Consecutive small functions/classes are packed into one chunk while it
+        stays within max_tokens and max_lines. Pass ``tree`` to reuse an
+        already parsed AST of ``code``.
+
         Returns list of dicts with:
-        - type: 'function', 'class', 'partial', or 'full'
+        - type: 'function', 'class', 'group', 'partial', or 'full'
         - name: function/class name (if applicable)
         - code: the actual code
         - start_line, end_line: line numbers
         - imports: import statements for context
         """
         try:
-            tree = ast.parse(code)
+            if tree is None:
+                tree = ast.parse(code)
             chunks = []
             lines = code.split('\n')
-            
+            offsets = self._line_offsets(lines)
+
             # Extract all imports (needed for context in each chunk)
             imports = self._extract_imports(tree, lines)
-            
+
+            # Pending run of small nodes: (node, start, end)
+            group: List[Tuple[ast.AST, int, int]] = []
+            group_tokens = 0
+
             # Find top-level functions and classes
             for node in ast.iter_child_nodes(tree):
                 if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
                     start = node.lineno - 1
                     end = node.end_lineno if node.end_lineno else len(lines)
-                    
-                    chunk_code = '\n'.join(lines[start:end])
-                    
+
+                    chunk_code = code[offsets[start]:offsets[end] - 1]
+                    tokens = count_tokens(chunk_code)
+
                     # If chunk itself is too large, mark for line-based splitting
-                    if end - start > self.max_lines:
-                        sub_chunks = self._split_large_chunk(chunk_code, start, imports)
-                        chunks.extend(sub_chunks)
-                    else:
-                        chunks.append({
-                            'type': 'function' if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) else 'class',
-                            'name': node.name,
-                            'code': chunk_code,
-                            'start_line': start,
-                            'end_line': end,
-                            'imports': imports
-                        })
-            
+                    if tokens > self.max_tokens or end - start > self.max_lines:
+                        chunks.extend(self._flush_group(code, offsets, group, imports))
+                        group, group_tokens = [], 0
+                        chunks.extend(self._split_large_chunk(code, lines, offsets, start, end, imports))
+                        continue
+
+                    if group:
+                        # A group spans everything from its first node to its last,
+                        # so count the lines in between (decorators, constants) too
+                        tokens = count_tokens(code[offsets[group[-1][2]]:offsets[end] - 1])
+                        if group_tokens + tokens > self.max_tokens or end - group[0][1] > self.max_lines:
+                            chunks.extend(self._flush_group(code, offsets, group, imports))
+                            group, group_tokens = [], 0
+                            tokens = count_tokens(chunk_code)
+
+                    group.append((node, start, end))
+                    group_tokens += tokens
+
+            chunks.extend(self._flush_group(code, offsets, group, imports))
+
             # If no functions/classes found, return whole file
             if not chunks:
                 return [{
@@ -58,60 +115,104 @@ class CodeChunker:
                     'end_line': len(lines),
                     'imports': ''
                 }]
-            
+
             return chunks
-            
-        except SyntaxError:
-            # If parsing fails, fall back to line-based chunking
-            print(f"  ⚠️ Syntax error in {filepath}, using line-based chunking")
+
+        except (SyntaxError, MemoryError, RecursionError):
+            # If parsing fails (deeply nested input can exhaust the parser), fall back to line-based chunking
+            print(f"  ⚠️ Could not parse {filepath}, using line-based chunking")
             return self._chunk_by_lines(code)
-    
+
+    def _flush_group(self, code: str, offsets: List[int], group: List[Tuple[ast.AST, int, int]], imports: str) -> List[Dict]:
+        """Turn a run of packed nodes into a single chunk"""
+        if not group:
+            return []
+
+        first_node, start, _ = group[0]
+        last_node, _, end = group[-1]
+
+        if len(group) == 1:
+            chunk_type = 'function' if isinstance(first_node, (ast.FunctionDef, ast.AsyncFunctionDef)) else 'class'
+            name = first_node.name
+        else:
+            chunk_type = 'group'
+            name = f"{first_node.name}..{last_node.name}"
+
+        return [{
+            'type': chunk_type,
+            'name': name,
+            'code': code[offsets[start]:offsets[end] - 1],
+            'start_line': start,
+            'end_line': end,
+            'imports': imports
+        }]
+
+    def _line_offsets(self, lines: List[str]) -> List[int]:
+        """Start offset of every line, plus a sentinel one past the end of the code.
+
+        code[offsets[a]:offsets[b] - 1] equals '\n'.join(lines[a:b]) without rebuilding strings.
+        """
+        offsets = [0]
+        acc = 0
+        for line in lines:
+            acc += len(line) + 1
+            offsets.append(acc)
+        return offsets
+
+    def _line_ranges(self, lines: List[str], start: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Yield [i, j) line ranges within start..end that fit both max_lines and max_tokens"""
+        i = start
+        while i < end:
+            j = i
+            tokens = 0
+            while j < end and j - i < self.max_lines:
+                line_tokens = count_tokens(lines[j]) + 1  # + newline
+                if j > i and tokens + line_tokens > self.max_tokens:
+                    break
+                tokens += line_tokens
+                j += 1
+            yield i, j
+            i = j
+
     def _extract_imports(self, tree: ast.AST, lines: List[str]) -> str:
-        """Extract all import statements from the code"""
-        imports = []
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                if hasattr(node, 'lineno') and node.lineno <= len(lines):
-                    imports.append(lines[node.lineno - 1])
-            elif isinstance(node, ast.ImportFrom):
+        """Extract top-level import statements from the code"""
+        import_lines = []
+        for node in ast.iter_child_nodes(tree):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
                 if hasattr(node, 'lineno') and node.lineno <= len(lines):
-                    imports.append(lines[node.lineno - 1])
-        return '\n'.join(imports)
-    
-    def _split_large_chunk(self, chunk_code: str, start_line: int, imports: str) -> List[Dict]:
-        """Split a very large function/class into smaller pieces"""
-        lines = chunk_code.split('\n')
+                    import_lines.append(node.lineno)
+        return '\n'.join(lines[lineno - 1] for lineno in import_lines)
+
+    def _split_large_chunk(self, code: str, lines: List[str], offsets: List[int], start: int, end: int, imports: str) -> List[Dict]:
+        """Split a very large function/class (lines start..end) into smaller pieces"""
         sub_chunks = []
-        
-        for i in range(0, len(lines), self.max_lines):
-            sub_code = '\n'.join(lines[i:i + self.max_lines])
+
+        for i, sub_end in self._line_ranges(lines, start, end):
             sub_chunks.append({
                 'type': 'partial',
-                'name': f'partial_{start_line + i}',
-                'code': sub_code,
-                'start_line': start_line + i,
-                'end_line': start_line + min(i + self.max_lines, len(lines)),
+                'name': f'partial_{i}',
+                'code': code[offsets[i]:offsets[sub_end] - 1],
+                'start_line': i,
+                'end_line': sub_end,
                 'imports': imports
             })
-        
+
         return sub_chunks
-    
+
     def _chunk_by_lines(self, code: str) -> List[Dict]:
-        """Fallback: split code by line count when AST parsing fails"""
+        """Fallback: split code by line/token budget when AST parsing fails"""
         lines = code.split('\n')
+        offsets = self._line_offsets(lines)
         chunks = []
-        
-        for i in range(0, len(lines), self.max_lines):
-            chunk_lines = lines[i:i + self.max_lines]
-            chunk_code = '\n'.join(chunk_lines)
-            
+
+        for i, end in self._line_ranges(lines, 0, len(lines)):
             chunks.append({
                 'type': 'partial',
-                'name': f'lines_{i}_{i + len(chunk_lines)}',
-                'code': chunk_code,
+                'name': f'lines_{i}_{end}',
+                'code': code[offsets[i]:offsets[end] - 1],
                 'start_line': i,
-                'end_line': i + len(chunk_lines),
+                'end_line': end,
                 'imports': ''  # Can't reliably extract imports without parsing
             })
-        
-        return chunks
\ No newline at end of file
+
+        return chunks
@@ -15,6 +15,7 @@ from typing import Optional
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 import repo_upgrader
 from entrypoint_discovery import EntryPointDiscovery, interactive_entry_point_selection
+from utils import ZipRepoReader
 
 load_dotenv()
 
@@ -66,6 +67,9 @@ Examples:
   # Skip runtime validation
   ml-upgrader old_repo/ new_repo/ --no-runtime
   
+  # Upgrade up to 8 files at a time
+  ml-upgrader old_repo/ new_repo/ --parallel-files 8
+  
   # Use specific model
   ml-upgrader tensorflow_project/ modern_tf_project/ --model openai/gpt-4
   
@@ -107,6 +111,13 @@ The tool will:
         help="Maximum retry attempts per file (default: 5)"
     )
     
+    parser.add_argument(
+        "--parallel-files",
+        type=int,
+        default=5,
+        help="Number of files to upgrade concurrently (default: 5, 1 = sequential)"
+    )
+    
     parser.add_argument(
         "--command", "-c",
         type=str,
@@ -171,19 +182,30 @@ The tool will:
     
     # Handle .zip files
     temp_dir = None
+    repo_source = args.input_path
     if args.input_path.endswith('.zip'):
-        print("📦 Extracting .zip file...")
-        temp_dir = tempfile.mkdtemp()
-        extract_path = os.path.join(temp_dir, "extracted")
-        
-        try:
-            with zipfile.ZipFile(args.input_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_path)
-            args.input_path = extract_path
-            print(f"✅ Extracted to: {extract_path}")
-        except Exception as e:
-            print(f"❌ Failed to extract zip: {e}")
+        if not zipfile.is_zipfile(args.input_path):
+            print("❌ Failed to extract zip: File is not a zip file")
             sys.exit(1)
+        
+        if args.no_runtime or args.command:
+            # No discovery needed: unpack straight into the output repository
+            print("📦 Streaming .zip file into output repository...")
+            repo_source = ZipRepoReader(args.input_path)
+        else:
+            # Entry point discovery needs a working tree to scan
+            print("📦 Extracting .zip file...")
+            temp_dir = tempfile.mkdtemp()
+            extract_path = os.path.join(temp_dir, "extracted")
+            
+            try:
+                ZipRepoReader(args.input_path).extract_to(extract_path)
+                args.input_path = extract_path
+                repo_source = extract_path
+                print(f"✅ Extracted to: {extract_path}")
+            except Exception as e:
+                print(f"❌ Failed to extract zip: {e}")
+                sys.exit(1)
     
     print(f"\n{'='*60}")
     print(f"🔄 ML Repository Upgrader")
@@ -191,6 +213,7 @@ The tool will:
     print(f"📂 Input:  {args.input_path}")
     print(f"📂 Output: {args.output_path}")
     print(f"🤖 Model:  {args.model}")
+    print(f"⚡ Parallel files: {args.parallel_files}")
     print(f"{'='*60}\n")
     
     # Entry point discovery and selection
@@ -206,7 +229,7 @@ The tool will:
         if args.non_interactive:
             print("🔍 Discovering entry points (non-interactive mode)...\n")
             discovery = EntryPointDiscovery(args.input_path)
-            entries = discovery.discover_all()
+            entries = discovery.discover_all(top=1)
             
             if entries:
                 runtime_command = entries[0].command
@@ -250,7 +273,12 @@ The tool will:
         print("🚀 Starting upgrade process...\n")
         
         # Run the upgrade
-        report_path = repo_upgrader.upgrade_repo(args.input_path, args.output_path)
+        report_path = repo_upgrader.upgrade_repo(
+            repo_source,
+            args.output_path,
+            parallel=args.parallel_files > 1,
+            max_workers=max(1, args.parallel_files)
+        )
         
         print(f"\n{'='*60}")
         print("✅ Upgrade completed successfully!")
@@ -260,7 +288,7 @@ The tool will:
         
         # Show summary from report
         if os.path.exists(report_path):
-            with open(report_path, 'r') as f:
+            with open(report_path, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
                 for line in lines[:15]:  # Show first few lines
                     if '**' in line or '#' in line:
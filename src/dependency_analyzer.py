@@ -1,8 +1,13 @@
 import os
-import ast
-from typing import Dict, List, Set, Tuple
+import sys
+from typing import Dict, List, Optional, Set, Tuple
 from collections import defaultdict, deque
 
+try:  # Support both package and path-based execution
+    from .import_scanner import prefetch_imports, scan_imports  # type: ignore
+except ImportError:  # pragma: no cover
+    from import_scanner import prefetch_imports, scan_imports  # type: ignore
+
 class DependencyAnalyzer:
     """Analyze and order Python files by their import dependencies"""
     
@@ -10,77 +15,90 @@ class DependencyAnalyzer:
         self.repo_path = repo_path
         self.file_imports = {}  # file -> set of imported modules
         self.module_to_file = {}  # module name -> file path
-        self.dependency_graph = defaultdict(set)  # file -> files it depends on
+        self._module_names: Dict[str, str] = {}  # file path -> module name
+        # file -> files it depends on (sorted tuples once analyze_repository finishes)
+        self.dependency_graph: Dict[str, Tuple[str, ...]] = {}
     
     def analyze_repository(self, python_files: List[str]) -> Dict:
         """Analyze all files and build dependency graph"""
         print("Analyzing dependencies...")
         
+        # Paths and module names key every later dict/set lookup; interning
+        # them lets equal strings compare by identity
+        python_files = [sys.intern(f) for f in python_files]
+        
         # First pass: map modules to files
         for file_path in python_files:
             module_name = self._get_module_name(file_path)
             self.module_to_file[module_name] = file_path
         
-        # Second pass: extract imports
+        # Second pass: extract imports (parsing fans out to worker processes)
+        prefetch_imports(python_files)
         for file_path in python_files:
             imports = self._extract_imports(file_path)
             self.file_imports[file_path] = imports
         
         # Third pass: build dependency graph
+        graph = defaultdict(set, {f: set(deps) for f, deps in self.dependency_graph.items()})
         for file_path in python_files:
             imports = self.file_imports.get(file_path, set())
             for imp in imports:
                 if imp in self.module_to_file:
                     dependency_file = self.module_to_file[imp]
                     if dependency_file != file_path:  # avoid self-loops
-                        self.dependency_graph[file_path].add(dependency_file)
+                        graph[file_path].add(dependency_file)
+        
+        # Freeze for the read-only passes: tuples iterate faster and in a stable order
+        self.dependency_graph = {f: tuple(sorted(deps)) for f, deps in graph.items()}
         
         return {
             'total_files': len(python_files),
             'total_dependencies': sum(len(deps) for deps in self.dependency_graph.values()),
-            'files_with_deps': len([f for f in self.dependency_graph if self.dependency_graph[f]])
+            'files_with_deps': sum(1 for deps in self.dependency_graph.values() if deps)
         }
     
     def _get_module_name(self, file_path: str) -> str:
         """Convert file path to Python module name"""
+        module_path = self._module_names.get(file_path)
+        if module_path is not None:
+            return module_path
+        
         rel_path = os.path.relpath(file_path, self.repo_path)
-        module_path = rel_path.replace(os.sep, '.').replace('.py', '')
+        # Strip only the extension; '.py' may also appear inside names (e.g. pytools/)
+        if rel_path.endswith('.py'):
+            rel_path = rel_path[:-3]
+        module_path = rel_path.replace(os.sep, '.')
         
         # Handle __init__.py
         if module_path.endswith('.__init__'):
             module_path = module_path[:-9]
         
+        module_path = sys.intern(module_path)
+        self._module_names[file_path] = module_path
         return module_path
     
     def _extract_imports(self, file_path: str) -> Set[str]:
         """Extract all local imports from a Python file"""
         imports = set()
+        parts = None  # this file's module path, resolved on the first relative import
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                tree = ast.parse(f.read())
+        for module, level, names in scan_imports(file_path):
+            if module is None and level == 0:  # import x
+                for name in names:
+                    imports.add(sys.intern(name.partition('.')[0]))
             
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        imports.add(alias.name.split('.')[0])
-                
-                elif isinstance(node, ast.ImportFrom):
-                    if node.module and node.level == 0:  # absolute import
-                        imports.add(node.module.split('.')[0])
-                    elif node.level > 0:  # relative import
-                        # Handle relative imports like "from . import x" or "from .. import y"
-                        current_module = self._get_module_name(file_path)
-                        parts = current_module.split('.')
-                        if node.level <= len(parts):
-                            parent_parts = parts[:-node.level] if node.level > 0 else parts
-                            if node.module:
-                                imports.add('.'.join(parent_parts + [node.module.split('.')[0]]))
-                            else:
-                                imports.add('.'.join(parent_parts))
-        
-        except (SyntaxError, UnicodeDecodeError, OSError):
-            pass
+            elif level == 0:  # absolute import
+                imports.add(sys.intern(module.partition('.')[0]))
+            else:  # relative import
+                # Handle relative imports like "from . import x" or "from .. import y"
+                if parts is None:
+                    parts = self._get_module_name(file_path).split('.')
+                if level <= len(parts):
+                    parent_parts = parts[:-level]
+                    if module:
+                        imports.add(sys.intern('.'.join(parent_parts + [module.partition('.')[0]])))
+                    else:
+                        imports.add(sys.intern('.'.join(parent_parts)))
         
         return imports
     
@@ -89,27 +107,15 @@ class DependencyAnalyzer:
         Get files in dependency order using topological sort
         Files with no dependencies come first
         """
-        # Detect cycles
-        cycles = self._detect_cycles()
-        if cycles:
-            print(f"Warning: Detected {len(cycles)} circular dependencies")
-            for cycle in cycles[:3]:  # show first 3
-                cycle_names = [os.path.basename(f) for f in cycle]
-                print(f"  Cycle: {' -> '.join(cycle_names)}")
-        
-        # Topological sort with cycle handling
-        in_degree = defaultdict(int)
-        all_files = set(self.dependency_graph.keys())
-        
-        # Add files with no dependencies
-        for file_path in self.file_imports.keys():
-            if file_path not in all_files:
-                all_files.add(file_path)
-        
-        # Calculate in-degrees
-        for file_path in all_files:
-            for dep in self.dependency_graph[file_path]:
-                in_degree[dep] += 1
+        # Topological sort (Kahn's algorithm) with cycle handling
+        all_files = set(self.file_imports) | set(self.dependency_graph)
+        
+        # In-degree = number of unresolved dependencies of each file
+        in_degree = {f: len(self.dependency_graph.get(f, ())) for f in all_files}
+        dependents = defaultdict(set)  # file -> files that depend on it
+        for file_path, deps in self.dependency_graph.items():
+            for dep in deps:
+                dependents[dep].add(file_path)
         
         # Start with files that have no dependencies
         queue = deque([f for f in all_files if in_degree[f] == 0])
@@ -120,75 +126,159 @@ class DependencyAnalyzer:
             sorted_files.append(file_path)
             
             # Reduce in-degree for dependents
-            for other_file in all_files:
-                if file_path in self.dependency_graph[other_file]:
-                    in_degree[other_file] -= 1
-                    if in_degree[other_file] == 0:
-                        queue.append(other_file)
+            for other_file in dependents[file_path]:
+                in_degree[other_file] -= 1
+                if in_degree[other_file] == 0:
+                    queue.append(other_file)
         
         # Handle remaining files (part of cycles)
         remaining = all_files - set(sorted_files)
         if remaining:
+            # Every cycle lies in what Kahn's algorithm could not resolve,
+            # so only that subgraph needs the cycle search
+            cycles = self._detect_cycles(remaining)
+            if cycles:
+                print(f"Warning: Detected {len(cycles)} circular dependencies")
+                for cycle in cycles[:3]:  # show first 3
+                    cycle_names = [os.path.basename(f) for f in cycle]
+                    print(f"  Cycle: {' -> '.join(cycle_names)}")
+            
             print(f"Warning: {len(remaining)} files in cycles, adding at end")
             sorted_files.extend(sorted(remaining))
         
         return sorted_files
     
-    def _detect_cycles(self) -> List[List[str]]:
-        """Detect circular dependencies using DFS"""
-        visited = set()
-        rec_stack = set()
+    def _detect_cycles(self, nodes: Optional[Set[str]] = None) -> List[List[str]]:
+        """Detect circular dependencies using an iterative DFS (optionally within nodes only)"""
+        WHITE, GRAY, BLACK = 0, 1, 2  # unvisited / on current path / finished
+        color: Dict[str, int] = {}
+        parent: Dict[str, str] = {}
         cycles = []
         
-        def dfs(node: str, path: List[str]):
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
+        graph = self.dependency_graph
+        if nodes is not None:
+            graph = {node: tuple(dep for dep in graph.get(node, ()) if dep in nodes) for node in nodes}
+        
+        for start in list(graph):
+            if color.get(start, WHITE) != WHITE:
+                continue
             
-            for neighbor in self.dependency_graph[node]:
-                if neighbor not in visited:
-                    dfs(neighbor, path[:])
-                elif neighbor in rec_stack:
-                    # Found cycle
-                    cycle_start = path.index(neighbor)
-                    cycle = path[cycle_start:] + [neighbor]
-                    cycles.append(cycle)
+            color[start] = GRAY
+            stack = [(start, iter(graph.get(start, ())))]
             
-            rec_stack.remove(node)
-        
-        for file_path in self.dependency_graph.keys():
-            if file_path not in visited:
-                dfs(file_path, [])
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    state = color.get(neighbor, WHITE)
+                    if state == WHITE:
+                        color[neighbor] = GRAY
+                        parent[neighbor] = node
+                        stack.append((neighbor, iter(graph.get(neighbor, ()))))
+                        break
+                    if state == GRAY:
+                        # Back edge: walk parents from node up to neighbor
+                        cycle = [node]
+                        while cycle[-1] != neighbor:
+                            cycle.append(parent[cycle[-1]])
+                        cycle.reverse()
+                        cycle.append(neighbor)
+                        cycles.append(cycle)
+                else:
+                    color[node] = BLACK
+                    stack.pop()
         
         return cycles
     
+    def _strongly_connected(self, nodes: Set[str]) -> List[List[str]]:
+        """Strongly connected components of the graph within nodes (iterative Tarjan)
+
+        Components are returned dependencies first: every component comes after
+        all the components it imports from.
+        """
+        graph = {node: [dep for dep in self.dependency_graph.get(node, ()) if dep in nodes]
+                 for node in nodes}
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack: Set[str] = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        
+        for start in sorted(nodes):
+            if start in index:
+                continue
+            index[start] = lowlink[start] = len(index)
+            stack.append(start)
+            on_stack.add(start)
+            work = [(start, iter(graph[start]))]
+            
+            while work:
+                node, neighbors = work[-1]
+                for neighbor in neighbors:
+                    if neighbor not in index:
+                        index[neighbor] = lowlink[neighbor] = len(index)
+                        stack.append(neighbor)
+                        on_stack.add(neighbor)
+                        work.append((neighbor, iter(graph[neighbor])))
+                        break
+                    if neighbor in on_stack:
+                        lowlink[node] = min(lowlink[node], index[neighbor])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        
+        return components
+    
     def get_dependency_levels(self) -> Dict[str, int]:
         """
         Assign level to each file (0 = no deps, 1 = depends on level 0, etc.)
         Useful for parallel processing within levels
         """
         levels = {}
+        files = list(self.file_imports.keys())
         
-        def get_level(file_path: str, visiting: Set[str]) -> int:
-            if file_path in levels:
-                return levels[file_path]
-            
-            if file_path in visiting:
-                # Circular dependency, assign current max + 1
-                return max(levels.values()) + 1 if levels else 0
-            
-            visiting.add(file_path)
-            
-            deps = self.dependency_graph[file_path]
-            if not deps:
-                level = 0
-            else:
-                level = max(get_level(dep, visiting.copy()) for dep in deps) + 1
+        # Kahn's order: a file's level is fixed once all its dependencies have one
+        pending = {f: len(self.dependency_graph.get(f, ())) for f in files}
+        dependents = defaultdict(list)
+        for file_path in files:
+            for dep in self.dependency_graph.get(file_path, ()):
+                dependents[dep].append(file_path)
+        
+        queue = deque(f for f in files if pending[f] == 0)
+        while queue:
+            file_path = queue.popleft()
+            deps = self.dependency_graph.get(file_path, ())
+            levels[file_path] = max((levels[dep] for dep in deps), default=-1) + 1
             
-            levels[file_path] = level
-            return level
+            for other_file in dependents[file_path]:
+                pending[other_file] -= 1
+                if pending[other_file] == 0:
+                    queue.append(other_file)
         
-        for file_path in self.file_imports.keys():
-            get_level(file_path, set())
+        # Files in circular imports go after everything else, one level per
+        # cycle-free step: a cycle shares a level, its dependents follow it
+        if len(levels) < len(files):
+            cycle_level = max(levels.values(), default=-1) + 1
+            remaining = {f for f in files if f not in levels}
+            # Components come out dependencies first, so each one's level is final
+            for component in self._strongly_connected(remaining):
+                members = set(component)
+                dep_levels = [levels[dep] for f in component
+                              for dep in self.dependency_graph.get(f, ()) if dep not in members]
+                level = max(dep_levels, default=-1) + 1
+                if len(component) > 1 or component[0] in self.dependency_graph.get(component[0], ()):
+                    level = max(level, cycle_level)
+                for file_path in component:
+                    levels[file_path] = level
         
-        return levels
\ No newline at end of file
+        return levels
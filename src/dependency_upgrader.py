@@ -5,8 +5,18 @@ Intelligently detects and updates ML dependencies
 
 import os
 import re
-import ast
-from typing import Set, List, Dict
+import sys
+from typing import Callable, Set, List, Dict, Optional
+
+try:  # Support both package and path-based execution
+    from .import_scanner import RepoScanner, prefetch_imports, scan_imports  # type: ignore
+except ImportError:  # pragma: no cover
+    from import_scanner import RepoScanner, prefetch_imports, scan_imports  # type: ignore
+
+try:  # Optional: honour the repository's .gitignore when pathspec is installed
+    import pathspec  # type: ignore
+except ImportError:  # pragma: no cover
+    pathspec = None
 
 # Latest stable versions as of October 2025
 ML_DEPENDENCIES = {
@@ -34,42 +44,79 @@ ML_DEPENDENCIES = {
 }
 
 
+# Import names whose PyPI distribution is named differently
+IMPORT_ALIASES = {
+    'cv2': 'opencv-python',
+    'sklearn': 'scikit-learn',
+    'pil': 'pillow',
+}
+
+# Directories never scanned for imports
+IGNORED_DIRS = frozenset({
+    '__pycache__', '.git', '.svn', 'node_modules',
+    'venv', 'env', '.venv', '.tox', 'dist', 'build'
+})
+
+
+def _gitignore_matcher(repo_path: str) -> Optional[Callable[[str], bool]]:
+    """Build a matcher from repo_path/.gitignore (None without pathspec or a .gitignore)"""
+    if pathspec is None:
+        return None
+    try:
+        with open(os.path.join(repo_path, '.gitignore'), encoding='utf-8', errors='replace') as f:
+            spec = pathspec.PathSpec.from_lines('gitwildmatch', f)
+    except OSError:
+        return None
+    return spec.match_file
+
+
 class DependencyUpdater:
     """
     Intelligently detects and updates USED dependencies in requirements.txt and setup.py
     """
     
-    def __init__(self, ml_deps: Dict[str, str] = None):
+    def __init__(self, ml_deps: Dict[str, str] = None, verbose: bool = False):
         self.ml_dependencies = ml_deps or ML_DEPENDENCIES
+        self.verbose = verbose
         self.updated_deps: List[str] = []
+        self._pending_log: List[str] = []  # per-dependency console lines, written in one go
         self.detected_imports: Set[str] = set()
+        # Lowercased lookups built once instead of per line/import
+        self._ml_lower = {dep.lower(): version for dep, version in self.ml_dependencies.items()}
+        
+        # One pass over setup.py for all packages; longest names first so
+        # e.g. torchvision is not matched as torch + "vision"
+        self._dep_by_lower = {dep.lower(): dep for dep in self.ml_dependencies}
+        names = sorted(self._dep_by_lower, key=len, reverse=True)
+        self._setup_re = re.compile(
+            rf'(["\']?)({"|".join(map(re.escape, names))})[>=<!=]*[^"\',\]]*(["\']?)',
+            flags=re.IGNORECASE
+        )
     
-    def scan_project_imports(self, repo_path: str) -> Set[str]:
+    def scan_project_imports(self, repo_path: str, scanner: Optional[RepoScanner] = None) -> Set[str]:
         """
         Scan all Python files to detect actual imports used
         
         Args:
             repo_path: Root path of repository
+            scanner: Shared RepoScanner for repo_path (reuses its directory walk)
             
         Returns:
             Set of detected import names
         """
         all_imports = set()
         file_count = 0
+        scanner = scanner or RepoScanner(repo_path)
         
-        for root, dirs, files in os.walk(repo_path):
-            # Skip common non-source directories
-            dirs[:] = [d for d in dirs if d not in {
-                '__pycache__', '.git', '.svn', 'node_modules',
-                'venv', 'env', '.venv', '.tox', 'dist', 'build'
-            }]
-            
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    imports = self._extract_imports_from_file(file_path)
-                    all_imports.update(imports)
-                    file_count += 1
+        # Skip common non-source, hidden and git-ignored directories
+        python_files = list(scanner.python_files(IGNORED_DIRS, skip_hidden=True,
+                                                 ignore=_gitignore_matcher(repo_path)))
+        prefetch_imports(python_files)
+        
+        for file_path in python_files:
+            imports = self._extract_imports_from_file(file_path)
+            all_imports.update(imports)
+            file_count += 1
         
         print(f"📦 Scanned {file_count} Python files")
         print(f"📦 Detected imports: {sorted(all_imports)}")
@@ -89,33 +136,24 @@ class DependencyUpdater:
         """
         imports = set()
         
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            tree = ast.parse(content)
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        # Get top-level package name
-                        imports.add(alias.name.split('.')[0])
-                elif isinstance(node, ast.ImportFrom) and node.module:
+        for module, level, names in scan_imports(file_path):
+            if module is None and level == 0:
+                for name in names:
                     # Get top-level package name
-                    imports.add(node.module.split('.')[0])
-        
-        except (SyntaxError, UnicodeDecodeError, OSError) as e:
-            # Skip files that can't be parsed
-            pass
+                    imports.add(name.partition('.')[0])
+            elif module:
+                # Get top-level package name
+                imports.add(module.partition('.')[0])
         
         return imports
     
-    def update_requirements_txt(self, repo_path: str) -> bool:
+    def update_requirements_txt(self, repo_path: str, scanner: Optional[RepoScanner] = None) -> bool:
         """
         Update or create requirements.txt with detected dependencies
         
         Args:
             repo_path: Root path of repository
+            scanner: Shared RepoScanner for repo_path (reuses its directory walk)
             
         Returns:
             True if updated, False otherwise
@@ -124,7 +162,7 @@ class DependencyUpdater:
         
         # Scan project for imports
         print("🔍 Scanning project for imports...")
-        self.scan_project_imports(repo_path)
+        self.scan_project_imports(repo_path, scanner)
         
         seen_packages = set()
         updated_lines = []
@@ -153,12 +191,11 @@ class DependencyUpdater:
                 seen_packages.add(pkg_name)
                 
                 # Update if it's an ML dependency
-                if pkg_name in self.ml_dependencies:
-                    new_version = self.ml_dependencies[pkg_name]
+                new_version = self._ml_lower.get(pkg_name)
+                if new_version is not None:
                     new_line = f"{pkg_name}{new_version}"
-                    updated_lines.append(new_line + '\n')
-                    self.updated_deps.append(f"{line_stripped} → {new_line}")
-                    print(f"  ⬆️  {line_stripped} → {new_line}")
+                    updated_lines.append(f"{new_line}\n")
+                    self._record(f"{line_stripped} → {new_line}", f"  ⬆️  {line_stripped} → {new_line}")
                 else:
                     # Keep non-ML dependencies as-is
                     updated_lines.append(line)
@@ -172,21 +209,22 @@ class DependencyUpdater:
         for imp in sorted(self.detected_imports):
             imp_lower = imp.lower()
             
-            # Handle special cases (cv2 -> opencv-python)
-            if imp_lower == 'cv2':
-                imp_lower = 'opencv-python'
+            # Handle special cases (cv2 -> opencv-python, sklearn -> scikit-learn)
+            canonical = IMPORT_ALIASES.get(imp_lower, imp_lower)
             
-            if imp_lower in self.ml_dependencies and imp_lower not in seen_packages:
-                new_line = f"{imp_lower}{self.ml_dependencies[imp_lower]}"
-                updated_lines.append(new_line + '\n')
-                self.updated_deps.append(f"Added: {new_line}")
-                print(f"  ➕ Added: {new_line}")
+            version = self._ml_lower.get(canonical)
+            if version is not None and canonical not in seen_packages:
+                seen_packages.add(canonical)
+                new_line = f"{canonical}{version}"
+                updated_lines.append(f"{new_line}\n")
+                self._record(f"Added: {new_line}", f"  ➕ Added: {new_line}")
                 added_count += 1
         
-        # Write updated requirements.txt
-        with open(req_path, 'w') as f:
-            f.writelines(updated_lines)
+        # Write updated requirements.txt in one buffered write
+        with open(req_path, 'w', buffering=1 << 16) as f:
+            f.write(''.join(updated_lines))
         
+        self._flush_log()
         print(f"✅ requirements.txt updated:")
         print(f"   • {len(self.updated_deps)} total changes")
         print(f"   • {added_count} new dependencies added")
@@ -214,21 +252,23 @@ class DependencyUpdater:
         with open(setup_path, 'r') as f:
             content = f.read()
         
-        updated_content = content
-        update_count = 0
+        changed_deps = set()
         
-        for dep, version in self.ml_dependencies.items():
+        def replace(match: re.Match) -> str:
             # Match package in various formats: "pkg>=1.0", 'pkg>=1.0', pkg>=1.0
-            pattern = rf'(["\']?){re.escape(dep)}[>=<!=]*[^"\',\]]*(["\']?)'
-            replacement = rf'\1{dep}{version}\2'
-            
-            new_content = re.sub(pattern, replacement, updated_content, flags=re.IGNORECASE)
-            
-            if new_content != updated_content:
-                self.updated_deps.append(f"Updated {dep} in setup.py → {version}")
-                print(f"  ⬆️  {dep} → {version}")
-                updated_content = new_content
-                update_count += 1
+            dep = self._dep_by_lower[match.group(2).lower()]
+            replacement = f"{match.group(1)}{dep}{self.ml_dependencies[dep]}{match.group(3)}"
+            if replacement != match.group(0):
+                changed_deps.add(dep)
+            return replacement
+        
+        updated_content = self._setup_re.sub(replace, content)
+        update_count = len(changed_deps)
+        
+        for dep, version in self.ml_dependencies.items():
+            if dep in changed_deps:
+                self._record(f"Updated {dep} in setup.py → {version}", f"  ⬆️  {dep} → {version}")
+        self._flush_log()
         
         if updated_content != content:
             with open(setup_path, 'w') as f:
@@ -239,6 +279,17 @@ class DependencyUpdater:
         print("ℹ️  setup.py already up-to-date")
         return False
     
+    def _record(self, change: str, log_line: str) -> None:
+        """Record a dependency change; its console line is deferred to _flush_log"""
+        self.updated_deps.append(change)
+        self._pending_log.append(log_line)
+    
+    def _flush_log(self) -> None:
+        """Write the pending per-dependency lines in a single call (only when verbose)"""
+        if self.verbose and self._pending_log:
+            sys.stdout.write('\n'.join(self._pending_log) + '\n')
+        self._pending_log.clear()
+    
     def get_update_summary(self) -> Dict[str, any]:
         """
         Get summary of updates made
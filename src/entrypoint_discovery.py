@@ -3,15 +3,115 @@ Entry Point Discovery Module
 Intelligently parses README files to discover and suggest entry points for runtime validation
 """
 
+import ast
+import bisect
+import functools
+import heapq
+import itertools
+import operator
 import os
 import re
-from typing import List, Dict, Optional, Set
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Set, Tuple
 from dataclasses import dataclass
 
+try:  # Support both package and path-based execution
+    from .import_scanner import RepoScanner  # type: ignore
+    from .utils import LRUCache  # type: ignore
+except ImportError:  # pragma: no cover
+    from import_scanner import RepoScanner  # type: ignore
+    from utils import LRUCache  # type: ignore
+
+# README path -> (mtime_ns, size, entries), shared by every EntryPointDiscovery so
+# a README that has not changed since it was last parsed is never scanned again
+README_CACHE_SIZE = 128
+_readme_cache = LRUCache(README_CACHE_SIZE)
+
+# READMEs modified this recently are not cached: a rewrite within the same
+# timestamp tick and at the same size would leave the cache key unchanged
+_README_CACHE_MIN_AGE_NS = 2_000_000_000
+
+
+def _listed_files(listing: Iterable[Tuple[str, List[str], List[str]]], root: str,
+                  skip_dirs: Iterable[str] = (), skip_hidden: bool = False) -> Iterator[Tuple[str, str]]:
+    """Yield (path, name) of the files in an os.walk-style listing of root, pruning skipped dirs"""
+    skip_dirs = frozenset(skip_dirs)
+    skipped = set()
+    for dirpath, _, files in listing:
+        if dirpath != root:
+            # Top-down order, so a skipped parent has already been seen
+            parent, _, name = dirpath.rpartition(os.sep)
+            if parent in skipped or name in skip_dirs or (skip_hidden and name.startswith('.')):
+                skipped.add(dirpath)
+                continue
+        prefix = os.path.join(dirpath, '')
+        for name in files:
+            yield prefix + name, name
+
+
+def _script_names(specs: Iterable[str]) -> List[str]:
+    """Command names from 'name = module:func' entry point specs"""
+    return [spec.split('=')[0].strip() for spec in specs if '=' in spec]
+
+
+def _literal_console_scripts(entry_points: Any) -> Optional[List[str]]:
+    """console_scripts names from a literal entry_points value (dict or INI-style string)"""
+    if isinstance(entry_points, str):
+        section = None
+        specs = []
+        for line in entry_points.splitlines():
+            line = line.strip()
+            if line.startswith('['):
+                section = line.strip('[] ')
+            elif section == 'console_scripts':
+                specs.append(line)
+        return _script_names(specs)
+    if isinstance(entry_points, dict):
+        scripts = entry_points.get('console_scripts', ())
+        if isinstance(scripts, str):
+            scripts = scripts.splitlines()
+        if isinstance(scripts, (list, tuple)):
+            return _script_names(spec for spec in scripts if isinstance(spec, str))
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def _setup_console_scripts(path: str, mtime_ns: int, size: int) -> Optional[Tuple[str, ...]]:
+    """console_scripts names declared by a setup.py, parsed once per (path, mtime, size)
+
+    The setup() call is read with ast, never executed. Returns None when
+    the file does not parse or its entry_points is not a literal.
+    """
+    with open(path, 'rb') as f:
+        source = f.read()
+    if b'console_scripts' not in source:
+        return ()
+    try:
+        tree = ast.parse(source, path)
+    except (SyntaxError, ValueError):
+        return None
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        if (getattr(node.func, 'id', None) or getattr(node.func, 'attr', None)) != 'setup':
+            continue
+        for keyword in node.keywords:
+            if keyword.arg == 'entry_points':
+                try:
+                    names = _literal_console_scripts(ast.literal_eval(keyword.value))
+                except (ValueError, TypeError):
+                    return None
+                return None if names is None else tuple(names)
+    return None
+
 
 @dataclass
 class EntryPoint:
     """Discovered entry point with metadata"""
+    # No per-instance __dict__ (dataclass(slots=True) needs 3.10; setup.py allows 3.8)
+    __slots__ = ('command', 'description', 'confidence', 'source_line', 'context', 'type')
+    
     command: str
     description: str
     confidence: float  # 0.0 to 1.0
@@ -23,61 +123,122 @@ class EntryPoint:
 class EntryPointDiscovery:
     """Discover runnable entry points from README and project structure"""
     
-    # Patterns for finding commands in README
+    # Patterns for finding commands in README: (group name, pattern, type, confidence)
     COMMAND_PATTERNS = [
         # Python execution patterns
-        (r'python\s+([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.9),
-        (r'python3\s+([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.9),
-        (r'(?:^|\s)\.\/([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.8),
+        ('python_script', r'python\s+([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.9),
+        ('python3_script', r'python3\s+([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.9),
+        ('local_script', r'(?:^|\s)\.\/([a-zA-Z0-9_/.-]+\.py)(?:\s+(.*))?', 'python', 0.8),
         
         # Pytest patterns
-        (r'pytest(?:\s+([a-zA-Z0-9_/.-]*))?', 'pytest', 0.85),
-        (r'py\.test(?:\s+([a-zA-Z0-9_/.-]*))?', 'pytest', 0.85),
+        ('pytest', r'pytest(?:\s+([a-zA-Z0-9_/.-]*))?', 'pytest', 0.85),
+        ('py_test', r'py\.test(?:\s+([a-zA-Z0-9_/.-]*))?', 'pytest', 0.85),
         
         # Python module execution
-        (r'python\s+-m\s+([a-zA-Z0-9_.-]+)(?:\s+(.*))?', 'python', 0.9),
+        ('python_module', r'python\s+-m\s+([a-zA-Z0-9_.-]+)(?:\s+(.*))?', 'python', 0.9),
         
         # Jupyter patterns
-        (r'jupyter\s+notebook(?:\s+([a-zA-Z0-9_/.-]+\.ipynb))?', 'jupyter', 0.7),
+        ('jupyter', r'jupyter\s+notebook(?:\s+([a-zA-Z0-9_/.-]+\.ipynb))?', 'jupyter', 0.7),
         
         # Shell script patterns
-        (r'(?:bash|sh)\s+([a-zA-Z0-9_/.-]+\.sh)(?:\s+(.*))?', 'shell', 0.7),
-        (r'\.\/([a-zA-Z0-9_/.-]+\.sh)(?:\s+(.*))?', 'shell', 0.7),
+        ('shell_script', r'(?:bash|sh)\s+([a-zA-Z0-9_/.-]+\.sh)(?:\s+(.*))?', 'shell', 0.7),
+        ('local_shell', r'\.\/([a-zA-Z0-9_/.-]+\.sh)(?:\s+(.*))?', 'shell', 0.7),
     ]
     
-    # Keywords that indicate runnable examples
-    EXAMPLE_KEYWORDS = [
-        'usage', 'example', 'quickstart', 'getting started',
-        'run', 'execute', 'demo', 'tutorial', 'how to use'
-    ]
+    # All command patterns as one anchored alternation of lookaheads, tried in
+    # order of confidence: a single match() per line finds the best pattern
+    # occurring anywhere in it, and match.lastgroup names it
+    COMMAND_RE = re.compile('|'.join(
+        rf'(?=[\s\S]*?(?P<{name}>{pattern}))'
+        for name, pattern, _, _ in sorted(COMMAND_PATTERNS, key=lambda p: -p[3])
+    ))
+    COMMAND_TYPES = {name: (cmd_type, confidence) for name, _, cmd_type, confidence in COMMAND_PATTERNS}
+    
+    # Every command pattern contains one of these literals; lines without any are
+    # rejected by fast substring checks before the regex runs
+    COMMAND_HINTS = ('py', './', 'jupyter', 'sh')
+    COMMAND_HINT_BYTES = tuple(hint.encode('ascii') for hint in COMMAND_HINTS)
+    
+    # Language tags of scanned code blocks ('' is an untagged fence), the fence, inline code
+    # and markdown emphasis markers
+    CODE_BLOCK_TAGS = frozenset({'', 'bash', 'sh', 'python', 'shell'})
+    FENCE_RE = re.compile('```')
+    INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+    MARKDOWN_FORMAT_RE = re.compile(r'[*_`]')
+    
+    # setup.py console_scripts list and the quoted scripts inside it
+    CONSOLE_SCRIPTS_RE = re.compile(
+        r'entry_points\s*=\s*\{[^}]*["\']console_scripts["\']\s*:\s*\[(.*?)\]',
+        re.DOTALL
+    )
+    QUOTED_RE = re.compile(r'["\']([^"\']+)["\']')
+    
+    # README file names matched exactly (any file starting with "readme" also counts)
+    README_NAMES = frozenset({'README.md', 'README.rst', 'README.txt', 'README', 'readme.md'})
+    
+    # (file name, confidence, description) of entry scripts probed in the project root
+    COMMON_ENTRY_FILES = (
+        ('main.py', 0.85, 'Standard main entry point'),
+        ('app.py', 0.8, 'Application entry point'),
+        ('run.py', 0.8, 'Run script'),
+        ('train.py', 0.75, 'ML training script'),
+        ('test.py', 0.7, 'Test script'),
+        ('demo.py', 0.7, 'Demo script'),
+        ('example.py', 0.65, 'Example script'),
+    )
     
-    def __init__(self, project_root: str):
+    # Requirements files in the project root that may list pytest
+    REQUIREMENTS_FILES = ('requirements.txt', 'requirements-dev.txt')
+    
+    # unittest imports sit at the top of a test module, so only its head is read
+    UNITTEST_RE = re.compile(rb'(?:import|from) unittest')
+    UNITTEST_SCAN_BYTES = 4096
+    
+    # Keywords that indicate runnable examples, most common first so that
+    # any() usually stops early. Plain substring checks on a once-lowercased
+    # context beat a single re.IGNORECASE alternation several times over here.
+    EXAMPLE_KEYWORDS = (
+        'run', 'example', 'usage', 'demo', 'quickstart',
+        'getting started', 'tutorial', 'execute', 'how to use'
+    )
+    
+    def __init__(self, project_root: str, scanner: Optional[RepoScanner] = None):
         self.project_root = project_root
+        # A caller that already walked the tree (e.g. for a file listing) can share it
+        self.scanner = scanner if scanner is not None else RepoScanner(project_root)
         self.discovered_entries: List[EntryPoint] = []
+        # The same entries keyed by command (commands are unique after deduplication)
+        self.by_command: Dict[str, EntryPoint] = {}
+        # Filesystem results reused by repeated discover_all() calls on this instance
+        self._memo: Dict[str, Any] = {}
+        self._file_cache: Dict[str, Tuple[int, int, bytes]] = {}  # path -> (mtime_ns, size, data)
     
-    def discover_all(self) -> List[EntryPoint]:
-        """Main discovery method - finds all possible entry points"""
-        self.discovered_entries = []
-        
-        # 1. Parse README files
-        readme_entries = self._parse_readme_files()
-        self.discovered_entries.extend(readme_entries)
-        
-        # 2. Scan for common entry point files
-        file_entries = self._scan_common_files()
-        self.discovered_entries.extend(file_entries)
-        
-        # 3. Detect test frameworks
-        test_entries = self._detect_test_framework()
-        self.discovered_entries.extend(test_entries)
-        
-        # 4. Look for setup.py entry points
-        setup_entries = self._parse_setup_py()
-        self.discovered_entries.extend(setup_entries)
-        
-        # Remove duplicates and sort by confidence
-        self.discovered_entries = self._deduplicate_entries(self.discovered_entries)
-        self.discovered_entries.sort(key=lambda e: e.confidence, reverse=True)
+    def discover_all(self, top: Optional[int] = None) -> List[EntryPoint]:
+        """Main discovery method - finds all possible entry points
+
+        With top, only the top highest-confidence entries are kept (in the same
+        order a full sort would give), without sorting everything.
+        """
+        # Entries are deduplicated as they arrive, keeping the highest confidence per command
+        best: Dict[str, EntryPoint] = {}
+        
+        sources = (
+            self._parse_readme_files,     # 1. Parse README files
+            self._scan_common_files,      # 2. Scan for common entry point files
+            self._detect_test_framework,  # 3. Detect test frameworks
+            self._parse_setup_py,         # 4. Look for setup.py entry points
+        )
+        for source in sources:
+            for entry in source():
+                self._register(best, entry)
+        
+        # Sort by confidence
+        by_confidence = operator.attrgetter('confidence')
+        if top is not None and top < len(best):
+            self.discovered_entries = heapq.nlargest(top, best.values(), key=by_confidence)
+        else:
+            self.discovered_entries = sorted(best.values(), key=by_confidence, reverse=True)
+        self.by_command = {entry.command: entry for entry in self.discovered_entries}
         
         return self.discovered_entries
     
@@ -86,47 +247,77 @@ class EntryPointDiscovery:
         entries = []
         readme_paths = self._find_readme_files()
         
-        for readme_path in readme_paths:
-            try:
-                with open(readme_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+        if len(readme_paths) > 1:
+            # Overlap the reads of several READMEs (e.g. in monorepos); map keeps file order
+            with ThreadPoolExecutor(max_workers=min(8, len(readme_paths))) as executor:
+                for readme_entries in executor.map(self._parse_readme, readme_paths):
+                    entries.extend(readme_entries)
+        else:
+            for readme_path in readme_paths:
+                entries.extend(self._parse_readme(readme_path))
+        
+        return entries
+    
+    def _parse_readme(self, readme_path: str) -> List[EntryPoint]:
+        """Parse a single README file for command examples (see _readme_cache)"""
+        entries = []
+        try:
+            st = os.stat(readme_path)
+            cached = _readme_cache.get(readme_path)
+            if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+                return list(cached[2])
+            data = self._read_bytes(readme_path)
+            # Every command pattern contains an ASCII hint, so READMEs without
+            # one are never decoded or scanned
+            if any(hint in data for hint in self.COMMAND_HINT_BYTES):
+                content = self._decode(data)
+                line_index = self._line_index(content)
+                code_blocks = self._find_code_blocks(content)
                 
                 # Extract commands from code blocks
-                entries.extend(self._extract_from_code_blocks(content, readme_path))
+                entries.extend(self._extract_from_code_blocks(content, readme_path, line_index, code_blocks))
                 
                 # Extract commands from inline code
-                entries.extend(self._extract_from_inline_code(content, readme_path))
-                
-            except Exception as e:
-                print(f"⚠️ Could not parse {readme_path}: {e}")
+                entries.extend(self._extract_from_inline_code(content, readme_path, line_index, code_blocks))
+            
+            if time.time_ns() - st.st_mtime_ns >= _README_CACHE_MIN_AGE_NS:
+                _readme_cache[readme_path] = (st.st_mtime_ns, st.st_size, tuple(entries))
+            
+        except Exception as e:
+            print(f"⚠️ Could not parse {readme_path}: {e}")
         
         return entries
     
     def _find_readme_files(self) -> List[str]:
-        """Find all README files in the project"""
+        """Find all README files in the project (walked once per instance)"""
+        readme_files = self._memo.get('readme_files')
+        if readme_files is not None:
+            return readme_files
         readme_files = []
-        readme_names = ['README.md', 'README.rst', 'README.txt', 'README', 'readme.md']
         
-        for root, dirs, files in os.walk(self.project_root):
-            # Skip hidden and common non-source directories
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['__pycache__', 'node_modules']]
-            
-            for file in files:
-                if file in readme_names or file.lower().startswith('readme'):
-                    readme_files.append(os.path.join(root, file))
+        # Skip hidden and common non-source directories
+        for path, name in self._files(('__pycache__', 'node_modules'), skip_hidden=True):
+            # Only names starting with r/R can match, so most files skip the lower()
+            if name in self.README_NAMES or (name[:1] in ('R', 'r') and name.lower().startswith('readme')):
+                readme_files.append(path)
         
+        self._memo['readme_files'] = readme_files
         return readme_files
     
-    def _extract_from_code_blocks(self, content: str, source_file: str) -> List[EntryPoint]:
+    def _extract_from_code_blocks(self, content: str, source_file: str,
+                                  line_index: Optional[Tuple[List[str], List[int]]] = None,
+                                  code_blocks: Optional[List[Tuple[int, int, str]]] = None) -> List[EntryPoint]:
         """Extract commands from markdown/rst code blocks"""
         entries = []
+        line_index = line_index or self._line_index(content)
         
         # Find all code blocks (markdown style)
-        code_blocks = re.finditer(r'```(?:bash|sh|python|shell)?\n(.*?)```', content, re.DOTALL)
+        if code_blocks is None:
+            code_blocks = self._find_code_blocks(content)
         
-        for match in code_blocks:
-            block_content = match.group(1)
+        for block_start, _, block_content in code_blocks:
             lines = block_content.split('\n')
+            context = None  # same for every line of the block; built on its first command
             
             for line_num, line in enumerate(lines):
                 line = line.strip()
@@ -135,72 +326,118 @@ class EntryPointDiscovery:
                 if not line or line.startswith('#'):
                     continue
                 
-                # Check against patterns
-                for pattern, cmd_type, base_confidence in self.COMMAND_PATTERNS:
-                    if re.search(pattern, line):
-                        # Check if line is in an example section
-                        context = self._get_context(content, match.start())
-                        confidence = base_confidence
-                        
-                        if any(keyword in context.lower() for keyword in self.EXAMPLE_KEYWORDS):
-                            confidence += 0.05
-                        
-                        entries.append(EntryPoint(
-                            command=line,
-                            description=self._extract_description(content, match.start()),
-                            confidence=min(confidence, 1.0),
-                            source_line=line_num,
-                            context=context,
-                            type=cmd_type
-                        ))
+                matched = self._match_command(line)
+                if matched is None:
+                    continue
+                cmd_type, base_confidence = matched
+                
+                if context is None:
+                    context = self._get_context(content, block_start)
+                    description = self._extract_description(content, block_start, line_index)
+                    # Check if block is in an example section
+                    bonus = 0.05 if self._in_example_section(context) else 0
+                
+                entries.append(EntryPoint(
+                    command=line,
+                    description=description,
+                    confidence=min(base_confidence + bonus, 1.0),
+                    source_line=line_num,
+                    context=context,
+                    type=cmd_type
+                ))
         
         return entries
     
-    def _extract_from_inline_code(self, content: str, source_file: str) -> List[EntryPoint]:
-        """Extract commands from inline code (backticks)"""
+    def _find_code_blocks(self, content: str) -> List[Tuple[int, int, str]]:
+        """Find fenced code blocks with a scanned language tag as (start, end, body)
+
+        Same blocks as matching ```(?:bash|sh|python|shell)?\\n(.*?)``` with
+        re.DOTALL, but the scan jumps from fence to fence instead of backtracking
+        through every block body. The literal fence search is left to the regex
+        engine, which finds repeated-character needles faster than str.find.
+        """
+        blocks = []
+        find_fence = self.FENCE_RE.search
+        fence = find_fence(content)
+        while fence is not None:
+            start = fence.start()
+            newline = content.find('\n', start + 3)
+            if newline == -1:
+                break
+            if content[start + 3:newline] not in self.CODE_BLOCK_TAGS:
+                fence = find_fence(content, start + 1)  # not an opener; try the next fence
+                continue
+            close = find_fence(content, newline + 1)
+            if close is None:
+                break
+            end = close.start()
+            blocks.append((start, end + 3, content[newline + 1:end]))
+            fence = find_fence(content, end + 3)
+        return blocks
+    
+    def _extract_from_inline_code(self, content: str, source_file: str,
+                                  line_index: Optional[Tuple[List[str], List[int]]] = None,
+                                  code_blocks: Optional[List[Tuple[int, int, str]]] = None) -> List[EntryPoint]:
+        """Extract commands from inline code (backticks), outside fenced code blocks"""
         entries = []
+        line_index = line_index or self._line_index(content)
+        if code_blocks is None:
+            code_blocks = self._find_code_blocks(content)
+        
+        # Blank out the fenced blocks _extract_from_code_blocks already covers, so
+        # their backticks are not paired up as inline code; equal-length padding
+        # keeps every position valid for the original content
+        pieces, last = [], 0
+        for start, end, _ in code_blocks:
+            pieces.append(content[last:start])
+            pieces.append(' ' * (end - start))
+            last = end
+        pieces.append(content[last:])
         
         # Find inline code
-        inline_code = re.finditer(r'`([^`]+)`', content)
+        inline_code = self.INLINE_CODE_RE.finditer(''.join(pieces))
         
         for match in inline_code:
             command = match.group(1).strip()
             
-            # Check against patterns
-            for pattern, cmd_type, base_confidence in self.COMMAND_PATTERNS:
-                if re.search(pattern, command):
-                    context = self._get_context(content, match.start())
-                    
-                    # Lower confidence for inline code
-                    confidence = base_confidence - 0.2
-                    
-                    entries.append(EntryPoint(
-                        command=command,
-                        description=self._extract_description(content, match.start()),
-                        confidence=max(confidence, 0.0),
-                        source_line=0,
-                        context=context,
-                        type=cmd_type
-                    ))
+            matched = self._match_command(command)
+            if matched is None:
+                continue
+            cmd_type, base_confidence = matched
+            context = self._get_context(content, match.start())
+            
+            # Lower confidence for inline code
+            confidence = base_confidence - 0.2
+            
+            entries.append(EntryPoint(
+                command=command,
+                description=self._extract_description(content, match.start(), line_index),
+                confidence=max(confidence, 0.0),
+                source_line=0,
+                context=context,
+                type=cmd_type
+            ))
         
         return entries
     
+    def _in_example_section(self, context: str) -> bool:
+        """Check whether context mentions any EXAMPLE_KEYWORDS (case-insensitively)"""
+        context_lower = context.lower()
+        return any(keyword in context_lower for keyword in self.EXAMPLE_KEYWORDS)
+    
+    def _match_command(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return (type, base confidence) of the best command pattern found in text"""
+        if not any(hint in text for hint in self.COMMAND_HINTS):
+            return None
+        match = self.COMMAND_RE.match(text)
+        return self.COMMAND_TYPES[match.lastgroup] if match else None
+    
     def _scan_common_files(self) -> List[EntryPoint]:
         """Scan for common entry point files in project root"""
         entries = []
-        common_files = [
-            ('main.py', 0.85, 'Standard main entry point'),
-            ('app.py', 0.8, 'Application entry point'),
-            ('run.py', 0.8, 'Run script'),
-            ('train.py', 0.75, 'ML training script'),
-            ('test.py', 0.7, 'Test script'),
-            ('demo.py', 0.7, 'Demo script'),
-            ('example.py', 0.65, 'Example script'),
-        ]
-        
-        for filename, confidence, description in common_files:
-            file_path = os.path.join(self.project_root, filename)
-            if os.path.exists(file_path):
+        root_names = self._root_names()
+        for filename, confidence, description in self.COMMON_ENTRY_FILES:
+            if filename in root_names:
                 entries.append(EntryPoint(
                     command=f"python {filename}",
                     description=description,
@@ -245,35 +482,26 @@ class EntryPointDiscovery:
         entries = []
         setup_path = os.path.join(self.project_root, 'setup.py')
         
-        if not os.path.exists(setup_path):
+        if 'setup.py' not in self._root_names():
             return entries
         
         try:
-            with open(setup_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            st = os.stat(setup_path)
+            command_names = _setup_console_scripts(setup_path, st.st_mtime_ns, st.st_size)
+            if command_names is None:
+                # e.g. entry_points built in a variable: fall back to matching the source
+                match = self.CONSOLE_SCRIPTS_RE.search(self._read_text(setup_path))
+                command_names = _script_names(self.QUOTED_RE.findall(match.group(1))) if match else ()
             
-            # Find console_scripts or entry_points
-            entry_points_match = re.search(
-                r'entry_points\s*=\s*\{[^}]*["\']console_scripts["\']\s*:\s*\[(.*?)\]',
-                content,
-                re.DOTALL
-            )
-            
-            if entry_points_match:
-                scripts = entry_points_match.group(1)
-                script_lines = re.findall(r'["\']([^"\']+)["\']', scripts)
-                
-                for script in script_lines:
-                    if '=' in script:
-                        command_name = script.split('=')[0].strip()
-                        entries.append(EntryPoint(
-                            command=command_name,
-                            description=f"Console script from setup.py: {command_name}",
-                            confidence=0.95,
-                            source_line=0,
-                            context="Defined in setup.py entry_points",
-                            type='python'
-                        ))
+            for command_name in command_names:
+                entries.append(EntryPoint(
+                    command=command_name,
+                    description=f"Console script from setup.py: {command_name}",
+                    confidence=0.95,
+                    source_line=0,
+                    context="Defined in setup.py entry_points",
+                    type='python'
+                ))
         
         except Exception as e:
             print(f"⚠️ Could not parse setup.py: {e}")
@@ -282,6 +510,12 @@ class EntryPointDiscovery:
     
     def _has_pytest(self) -> bool:
         """Check if project uses pytest"""
+        if 'has_pytest' not in self._memo:
+            self._memo['has_pytest'] = self._detect_pytest()
+        return self._memo['has_pytest']
+    
+    def _detect_pytest(self) -> bool:
+        """Look for pytest configuration, a tests directory or a pytest requirement"""
         indicators = [
             'pytest.ini',
             'pyproject.toml',  # might have pytest config
@@ -289,52 +523,110 @@ class EntryPointDiscovery:
             'tests',  # common test directory
         ]
         
-        for indicator in indicators:
-            if os.path.exists(os.path.join(self.project_root, indicator)):
-                return True
-        
-        # Check requirements.txt
-        req_path = os.path.join(self.project_root, 'requirements.txt')
-        if os.path.exists(req_path):
-            with open(req_path, 'r') as f:
-                if 'pytest' in f.read().lower():
-                    return True
+        root_names = self._root_names()
+        if not root_names.isdisjoint(indicators):
+            return True
+        
+        # Check the requirements files: a bytes search, no decoding or line parsing
+        for name in self.REQUIREMENTS_FILES:
+            if name in root_names:
+                try:
+                    with open(os.path.join(self.project_root, name), 'rb') as f:
+                        if b'pytest' in f.read().lower():
+                            return True
+                except OSError:
+                    continue
         
         return False
     
     def _has_unittest(self) -> bool:
         """Check if project uses unittest"""
-        # Look for test files with unittest imports
-        for root, _, files in os.walk(self.project_root):
-            for file in files:
-                if file.startswith('test_') and file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                            if 'import unittest' in content or 'from unittest' in content:
-                                return True
-                    except:
-                        pass
+        if 'has_unittest' not in self._memo:
+            self._memo['has_unittest'] = self._detect_unittest()
+        return self._memo['has_unittest']
+    
+    def _detect_unittest(self) -> bool:
+        """Look for test files with unittest imports"""
+        for path, name in self._files():
+            if name.startswith('test_') and name.endswith('.py'):
+                try:
+                    with open(path, 'rb') as f:
+                        head = f.read(self.UNITTEST_SCAN_BYTES)
+                except OSError:
+                    continue
+                if self.UNITTEST_RE.search(head):
+                    return True  # one hit is enough
         
         return False
     
+    def _files(self, skip_dirs: Iterable[str] = (), skip_hidden: bool = False) -> Iterator[Tuple[str, str]]:
+        """(path, name) of the project's files, from the scanner's walk"""
+        return _listed_files(self.scanner.walk(), self.project_root, skip_dirs, skip_hidden)
+    
+    def _root_names(self) -> Set[str]:
+        """Names in the project root from one directory read, for existence checks"""
+        names = self._memo.get('root_names')
+        if names is None:
+            listing = self.scanner.walk()
+            if listing and listing[0][0] == self.project_root:
+                # The walk's first entry is the root directory itself
+                _, dirs, files = listing[0]
+                names = set(dirs).union(files)
+            else:
+                names = set()  # unreadable root
+            self._memo['root_names'] = names
+        return names
+    
+    def _read_bytes(self, path: str) -> bytes:
+        """Read a file, reusing the previous read while its mtime and size are unchanged"""
+        st = os.stat(path)
+        cached = self._file_cache.get(path)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._file_cache[path] = (st.st_mtime_ns, st.st_size, data)
+        return data
+
+    @staticmethod
+    def _decode(data: bytes) -> str:
+        """Decode UTF-8 with the same newline translation as text-mode open()"""
+        content = data.decode('utf-8')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+
+    def _read_text(self, path: str) -> str:
+        """Read a UTF-8 file as text (see _read_bytes for caching)"""
+        return self._decode(self._read_bytes(path))
+    
     def _get_context(self, content: str, position: int, context_size: int = 200) -> str:
         """Get surrounding context for a position in the content"""
         start = max(0, position - context_size)
         end = min(len(content), position + context_size)
         return content[start:end]
     
-    def _extract_description(self, content: str, position: int) -> str:
+    def _line_index(self, content: str) -> Tuple[List[str], List[int]]:
+        """Split content into lines once, with each line's start offset (plus an end sentinel)"""
+        lines = content.split('\n')
+        return lines, [0, *itertools.accumulate(len(line) + 1 for line in lines)]
+    
+    def _extract_description(self, content: str, position: int,
+                             line_index: Optional[Tuple[List[str], List[int]]] = None) -> str:
         """Extract a description from surrounding text"""
-        lines = content[:position].split('\n')
+        lines, line_starts = line_index or self._line_index(content)
+        
+        # The line holding position (up to position) and the four full lines before it
+        line_no = bisect.bisect_right(line_starts, position) - 1
+        preceding = lines[max(0, line_no - 4):line_no]
+        preceding.append(content[line_starts[line_no]:position])
         
         # Look backwards for a heading or description
-        for line in reversed(lines[-5:]):
+        for line in reversed(preceding):
             line = line.strip()
             if line and not line.startswith('```') and not line.startswith('#'):
                 # Remove markdown formatting
-                line = re.sub(r'[*_`]', '', line)
+                line = self.MARKDOWN_FORMAT_RE.sub('', line)
                 if len(line) > 10 and len(line) < 100:
                     return line
         
@@ -345,12 +637,22 @@ class EntryPointDiscovery:
         seen: Dict[str, EntryPoint] = {}
         
         for entry in entries:
-            key = entry.command.strip().lower()
-            if key not in seen or entry.confidence > seen[key].confidence:
-                seen[key] = entry
+            self._register(seen, entry)
         
         return list(seen.values())
     
+    def _register(self, seen: Dict[str, EntryPoint], entry: EntryPoint):
+        """Add entry to seen unless an equal command with at least its confidence is there
+
+        Commands are compared case-insensitively with runs of whitespace
+        collapsed, so "python  main.py" and "python main.py" are one entry.
+        Near-duplicates that differ in arguments stay separate on purpose.
+        """
+        key = ' '.join(entry.command.lower().split())
+        current = seen.get(key)
+        if current is None or entry.confidence > current.confidence:
+            seen[key] = entry
+    
     def format_for_display(self, entries: List[EntryPoint], max_entries: int = 10) -> str:
         """Format entries for CLI display"""
         output = ["📋 Discovered Entry Points:\n"]
@@ -0,0 +1,391 @@
+"""
+Shared import scanning for DependencyAnalyzer and DependencyUpdater
+Each file is read and parsed at most once per (mtime, size) version,
+in worker processes when many files are scanned at once
+"""
+
+import ast
+import io
+import multiprocessing
+import os
+import time
+import tokenize
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:  # Support both package and path-based execution
+    from .utils import LRUCache  # type: ignore
+except ImportError:  # pragma: no cover
+    from utils import LRUCache  # type: ignore
+
+# (module, level, names): ``import a.b, c`` -> (None, 0, ('a.b', 'c'));
+# ``from ..pkg import x`` -> ('pkg', 2, ('x',)); ``from . import y`` -> (None, 1, ('y',))
+ImportRecord = Tuple[Optional[str], int, Tuple[str, ...]]
+
+# Below this many unparsed files a process pool costs more than it saves
+PARALLEL_PARSE_MIN_FILES = 64
+
+# Upper bound on parse worker processes; the default is min(cpu_count, this)
+MAX_PARSE_WORKERS = 8
+
+# Directory walks only go concurrent when the top level has at least this many subdirectories
+PARALLEL_WALK_MIN_DIRS = 5
+
+# Fields holding statement lists (if/for/while/try/with/def/class/match bodies)
+_STATEMENT_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+
+# Tokens that never start or end a statement
+_SKIPPED_TOKENS = frozenset({tokenize.COMMENT, tokenize.NL, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING})
+
+# realpath -> (mtime_ns, size, records); a changed file simply replaces its entry.
+# Sized to hold a large repository's files between prefetch_imports and the scans
+IMPORT_CACHE_SIZE = 32768
+_import_cache = LRUCache(IMPORT_CACHE_SIZE)
+
+# (dir names, file names, paths of dirs to descend into) of one directory
+DirScan = Tuple[List[str], List[str], List[str]]
+
+# dir path -> (mtime_ns, scan); adding, removing or renaming an entry bumps the
+# directory's mtime, so an unchanged mtime means an unchanged listing. Bounded, as
+# a long-lived UI process walks a fresh temp tree for every upload
+WALK_CACHE_SIZE = 8192
+_walk_cache = LRUCache(WALK_CACHE_SIZE)
+
+# Directories modified this recently are not cached: a change within the same
+# timestamp tick as the scan would leave the mtime (and a stale listing) unchanged
+_WALK_CACHE_MIN_AGE_NS = 2_000_000_000
+
+
+def _import_record(tokens: List[str]) -> Optional[ImportRecord]:
+    """Turn the tokens of one ``import``/``from`` statement into a record"""
+    if tokens[0] == 'import':
+        names, current, i = [], '', 1
+        while i < len(tokens):
+            tok = tokens[i]
+            if tok == 'as':
+                i += 2  # skip the alias
+                continue
+            if tok == ',':
+                names.append(current)
+                current = ''
+            else:
+                current += tok
+            i += 1
+        if current:
+            names.append(current)
+        return (None, 0, tuple(names)) if names else None
+
+    # from [.]* [module] import names
+    level, i = 0, 1
+    while i < len(tokens) and tokens[i] in ('.', '...'):
+        level += len(tokens[i])
+        i += 1
+    module = ''
+    while i < len(tokens) and tokens[i] != 'import':
+        module += tokens[i]
+        i += 1
+    if i == len(tokens) or (not module and not level):
+        return None
+
+    names = []
+    i += 1
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok == 'as':
+            i += 2
+            continue
+        if tok not in ('(', ')', ','):
+            names.append(tok)
+        i += 1
+    return (module or None, level, tuple(names))
+
+
+def _token_imports(source: str) -> Tuple[ImportRecord, ...]:
+    """Find import statements from the token stream, for source ast.parse rejects
+
+    Statements are recognised at logical line starts (and after ``;`` or a
+    compound statement's ``:``), so imports inside strings are ignored.
+    Raises tokenize.TokenError/SyntaxError on untokenizable source.
+    """
+    records = []
+    statement: Optional[List[str]] = None
+    at_start = True
+    depth = 0
+
+    for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+        tok_type, tok_str = tok.type, tok.string
+        if tok_type in _SKIPPED_TOKENS:
+            continue
+
+        if tok_type == tokenize.OP:
+            if tok_str in '([{':
+                depth += 1
+            elif tok_str in ')]}':
+                depth -= 1
+
+        if statement is not None:
+            if tok_type in (tokenize.NEWLINE, tokenize.ENDMARKER) or (tok_str == ';' and depth == 0):
+                record = _import_record(statement)
+                if record is not None:
+                    records.append(record)
+                statement = None
+                at_start = True
+            else:
+                statement.append(tok_str)
+            continue
+
+        if tok_type == tokenize.NEWLINE:
+            at_start = True
+        elif tok_type == tokenize.OP:
+            at_start = depth == 0 and tok_str in (';', ':')
+        elif at_start and tok_type == tokenize.NAME and tok_str in ('import', 'from'):
+            statement = [tok_str]
+        else:
+            at_start = False
+
+    return tuple(records)
+
+
+def _ast_imports(source: Union[str, bytes]) -> Tuple[ImportRecord, ...]:
+    """Collect import statements from a full parse (raises SyntaxError/ValueError)"""
+    tree = ast.parse(source)
+
+    # Imports are statements, so only statement lists need visiting; expressions
+    # (often most of the tree) are never descended into
+    records = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in _STATEMENT_FIELDS:
+            children = getattr(node, field, None)
+            if not isinstance(children, list):
+                continue
+            for child in children:
+                if isinstance(child, ast.Import):
+                    records.append((None, 0, tuple(alias.name for alias in child.names)))
+                elif isinstance(child, ast.ImportFrom):
+                    records.append((child.module, child.level, tuple(alias.name for alias in child.names)))
+                else:
+                    stack.append(child)
+    return tuple(records)
+
+
+def _parse_imports(file_path: str) -> Tuple[ImportRecord, ...]:
+    """Collect the import statements of file_path (module-level so it pickles)"""
+    try:
+        # Bytes go straight to the parser, which decodes them itself
+        # (honouring any coding cookie) instead of a separate str decode
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return ()
+
+    if b'import' not in data:
+        return ()  # nothing to find; skip parsing entirely
+
+    try:
+        return _ast_imports(data)
+    except (SyntaxError, ValueError):
+        pass
+
+    # Legacy (e.g. Python 2) or broken files: the token stream still shows the imports
+    try:
+        return _token_imports(data.decode('utf-8'))
+    except (UnicodeDecodeError, tokenize.TokenError, SyntaxError):
+        return ()
+
+
+def _cache_key(file_path: str) -> Optional[Tuple[str, int, int]]:
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return os.path.realpath(file_path), st.st_mtime_ns, st.st_size
+
+
+def _cached(key: Tuple[str, int, int]) -> Optional[Tuple[ImportRecord, ...]]:
+    entry = _import_cache.get(key[0])
+    if entry is not None and entry[:2] == key[1:]:
+        return entry[2]
+    return None
+
+
+def scan_imports(file_path: str) -> Tuple[ImportRecord, ...]:
+    """Return every import statement in file_path (empty if unreadable/unparsable)"""
+    key = _cache_key(file_path)
+    if key is None:
+        return ()
+    records = _cached(key)
+    if records is None:
+        records = _parse_imports(key[0])
+        _import_cache[key[0]] = (key[1], key[2], records)
+    return records
+
+
+def _parse_workers() -> int:
+    """Worker count from ML_UPGRADER_PARSE_WORKERS, capped at MAX_PARSE_WORKERS"""
+    default = min(os.cpu_count() or 1, MAX_PARSE_WORKERS)
+    value = os.getenv("ML_UPGRADER_PARSE_WORKERS")
+    if not value:
+        return default
+    try:
+        return min(int(value), MAX_PARSE_WORKERS)
+    except ValueError:
+        print(f"Ignoring invalid ML_UPGRADER_PARSE_WORKERS={value!r}, using {default}")
+        return default
+
+
+def prefetch_imports(file_paths: Iterable[str]) -> None:
+    """Parse not-yet-cached files across worker processes so scan_imports hits the cache
+
+    Set ML_UPGRADER_PARSE_WORKERS=1 to keep parsing in-process.
+    """
+    pending = [key for key in map(_cache_key, file_paths) if key is not None and _cached(key) is None]
+    if len(pending) < PARALLEL_PARSE_MIN_FILES:
+        return  # scan_imports parses lazily
+    workers = _parse_workers()
+    if workers <= 1:
+        return
+
+    # About four chunks per worker: few enough to amortize IPC, enough to keep
+    # every worker busy (a fixed 32 left most of them idle on mid-sized repos)
+    chunksize = max(1, len(pending) // (workers * 4))
+    try:
+        # spawn, not fork: the caller may be a threaded server (Streamlit), and forking
+        # a process with live threads can deadlock the child on a lock held mid-fork
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            paths = [key[0] for key in pending]
+            for key, records in zip(pending, executor.map(_parse_imports, paths, chunksize=chunksize)):
+                _import_cache[key[0]] = (key[1], key[2], records)
+    except Exception as exc:  # e.g. no multiprocessing support; fall back to lazy parsing
+        print(f"Parallel import scan unavailable ({exc}), parsing serially")
+
+
+def _scan_dir(path: str) -> Optional[DirScan]:
+    """One os.scandir of path: (dir names, file names, paths of dirs to descend into)
+
+    DirEntry types come from the directory read itself, so no per-entry stat is
+    needed, and an unchanged directory is answered from _walk_cache without
+    reading it at all. Returns None for an unreadable directory, which os.walk
+    skips too.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _walk_cache.get(path)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    dirs, files, subdirs = [], [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                    continue
+                dirs.append(entry.name)
+                if not entry.is_symlink():  # listed but not followed, like os.walk
+                    subdirs.append(entry.path)
+    except OSError:
+        return None
+    if time.time_ns() - mtime_ns >= _WALK_CACHE_MIN_AGE_NS:
+        _walk_cache[path] = (mtime_ns, (dirs, files, subdirs))
+    return dirs, files, subdirs
+
+
+def _scan_concurrently(top: str, max_workers: int) -> Dict[str, Optional[DirScan]]:
+    """Scan top and, if it is wide enough to be worth it, every directory below it on a thread pool"""
+    first = _scan_dir(top)
+    scans = {top: first}
+    if first is None or len(first[2]) < PARALLEL_WALK_MIN_DIRS:
+        return scans  # small tree: the remaining directories are scanned serially
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_dir, path): path for path in first[2]}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                scan = scans[pending.pop(future)] = future.result()
+                if scan is not None:
+                    for path in scan[2]:
+                        pending[executor.submit(_scan_dir, path)] = path
+    return scans
+
+
+def _walk(top: str, max_workers: int = 1) -> List[Tuple[str, List[str], List[str]]]:
+    """os.walk(top) as a list, built from one os.scandir per directory
+
+    Same top-down order and (root, dirs, files) triples as os.walk. With
+    max_workers > 1 directories are read concurrently, which overlaps the
+    syscall latency of large or network-mounted trees.
+    """
+    if max_workers > 1:
+        scans = _scan_concurrently(top, max_workers)
+
+        def scan(path):
+            return scans.pop(path) if path in scans else _scan_dir(path)
+    else:
+        scan = _scan_dir
+
+    listing = []
+    stack = [top]
+    while stack:
+        root = stack.pop()
+        result = scan(root)
+        if result is None:
+            continue
+        dirs, files, subdirs = result
+        listing.append((root, dirs, files))
+        stack.extend(reversed(subdirs))
+    return listing
+
+
+class RepoScanner:
+    """Walk a repository once and share the listing between consumers"""
+
+    def __init__(self, repo_path: str, max_workers: int = 1):
+        self.repo_path = repo_path
+        self.max_workers = max_workers
+        self._listing: Optional[List[Tuple[str, List[str], List[str]]]] = None
+
+    def walk(self) -> List[Tuple[str, List[str], List[str]]]:
+        """os.walk(repo_path), computed on first use and reused afterwards"""
+        if self._listing is None:
+            self._listing = _walk(self.repo_path, self.max_workers)
+        return self._listing
+
+    def python_files(self, skip_dirs: Iterable[str] = (), skip_hidden: bool = False,
+                     ignore: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        """Yield .py paths, pruning skipped directories together with everything below them
+
+        skip_dirs names directories to skip at any depth; ignore, if given, is
+        called with repo-relative POSIX paths (directories end in '/') and
+        returns True for paths to leave out, e.g. a .gitignore matcher.
+        """
+        skip_dirs = frozenset(skip_dirs)
+        skipped = set()
+        # Every walked root starts with this prefix, so relative paths are plain slices
+        rel_start = len(os.path.join(self.repo_path, ''))
+        for root, _, files in self.walk():
+            rel_root = ''
+            if root != self.repo_path:
+                # os.walk is top-down, so a skipped parent has already been seen
+                parent, _, name = root.rpartition(os.sep)
+                if (parent in skipped or name in skip_dirs
+                        or (skip_hidden and name.startswith('.'))):
+                    skipped.add(root)
+                    continue
+                if ignore is not None:
+                    rel_root = root[rel_start:].replace(os.sep, '/') + '/'
+                    if ignore(rel_root):
+                        skipped.add(root)
+                        continue
+            prefix = os.path.join(root, '')
+            for name in files:
+                if name.endswith('.py') and (ignore is None or not ignore(rel_root + name)):
+                    yield prefix + name
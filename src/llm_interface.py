@@ -1,14 +1,32 @@
+import asyncio
+import contextlib
+import hashlib
 import os
-from typing import Optional
+import threading
+from typing import List, Optional, Union
 import openai
 from dotenv import load_dotenv
-from together import Together
+from together import AsyncTogether, Together
+
+try:  # Support both package and path-based execution
+    from .utils import LRUCache  # type: ignore
+except ImportError:  # pragma: no cover
+    from utils import LRUCache  # type: ignore
 
 load_dotenv()
 
 DEFAULT_OPENROUTER_MODEL = "openai/gpt-4o-mini"
 DEFAULT_TOGETHER_MODEL = "openai/gpt-oss-20b"
 DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_LLM_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".ml_upgrader_cache", "llm")
+LLM_MEMORY_CACHE_SIZE = 4096
+# Requests in flight across the whole process. Each file worker runs its own event
+# loop, so per-loop semaphores would multiply with the worker count.
+LLM_MAX_IN_FLIGHT = max(1, int(os.getenv("ML_UPGRADER_PARALLELISM", "8")))
+_request_slots = threading.BoundedSemaphore(LLM_MAX_IN_FLIGHT)
+
+# In-process LRU of prompt digest -> response, backed by one file per digest on disk
+_response_cache = LRUCache(LLM_MEMORY_CACHE_SIZE)
 
 
 def _require_env(key: str) -> str:
@@ -18,6 +36,56 @@ def _require_env(key: str) -> str:
     return value
 
 
+def _cache_enabled() -> bool:
+    return os.getenv("ML_UPGRADER_LLM_CACHE", "1").strip().lower() not in {"0", "false", "no", "off"}
+
+
+def _effective_model(provider: str, model: Optional[str]) -> str:
+    if model:
+        return model
+    if provider == "together":
+        return os.getenv("TOGETHER_MODEL", DEFAULT_TOGETHER_MODEL)
+    return os.getenv("OPENROUTER_MODEL", DEFAULT_OPENROUTER_MODEL)
+
+
+def _cache_key(prompt: str, provider: str, model: Optional[str]) -> str:
+    material = f"{provider}\x00{_effective_model(provider, model)}\x00{prompt}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    cache_dir = os.getenv("ML_UPGRADER_LLM_CACHE_DIR", DEFAULT_LLM_CACHE_DIR)
+    return os.path.join(cache_dir, key[:2], f"{key}.txt")
+
+
+def _get_cached_response(key: str) -> Optional[str]:
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as fh:
+            response = fh.read()
+    except OSError:
+        return None
+
+    _response_cache[key] = response
+    return response
+
+
+def _store_cached_response(key: str, response: str) -> None:
+    _response_cache[key] = response
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            fh.write(response)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # Disk cache is best-effort; the in-memory entry still helps this run
+
+
 def _extract_content(response) -> str:
     message = response.choices[0].message  # type: ignore[attr-defined]
     content = getattr(message, "content", None)
@@ -52,6 +120,45 @@ def _generate_openrouter(prompt: str, model: Optional[str] = None) -> str:
     return _extract_content(response)
 
 
+def make_async_client(provider: str = "openrouter"):
+    """Async client for `provider`; callers pass it as client= and close it themselves."""
+    if provider == "together":
+        return AsyncTogether(api_key=_require_env("TOGETHER_API_KEY"))
+    if provider == "openrouter":
+        base_url = os.getenv("OPENROUTER_BASE_URL", DEFAULT_OPENROUTER_BASE_URL)
+        return openai.AsyncOpenAI(api_key=_require_env("OPENROUTER_API_KEY"), base_url=base_url)
+    raise ValueError(f"Unsupported provider '{provider}'")
+
+
+async def _agenerate_together(prompt: str, model: Optional[str] = None, client=None) -> str:
+    model_name = model or os.getenv("TOGETHER_MODEL", DEFAULT_TOGETHER_MODEL)
+
+    if client is None:
+        async with make_async_client("together") as owned_client:
+            return await _agenerate_together(prompt, model=model, client=owned_client)
+
+    response = await client.chat.completions.create(
+        model=model_name,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return _extract_content(response)
+
+
+async def _agenerate_openrouter(prompt: str, model: Optional[str] = None, client=None) -> str:
+    model_name = model or os.getenv("OPENROUTER_MODEL", DEFAULT_OPENROUTER_MODEL)
+
+    if client is None:
+        async with make_async_client("openrouter") as owned_client:
+            return await _agenerate_openrouter(prompt, model=model, client=owned_client)
+
+    response = await client.chat.completions.create(
+        model=model_name,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=2000,
+    )
+    return _extract_content(response)
+
+
 def generate(prompt: str, *, provider: str = "openrouter", model: Optional[str] = None) -> str:
     if provider == "together":
         return _generate_together(prompt, model=model)
@@ -66,9 +173,141 @@ def call_llm(
     *,
     provider: str = "openrouter",
 ) -> str:
-    """Call the configured LLM provider with sensible defaults."""
+    """Call the configured LLM provider with sensible defaults.
+
+    Cached responses are served, but new ones are not stored: the caller
+    confirms a response with cache_response() once it has passed validation.
+    """
     provider_model = None if model == DEFAULT_OPENROUTER_MODEL else model
+    use_cache = _cache_enabled()
+    if use_cache:
+        key = _cache_key(prompt, provider, provider_model)
+        cached = _get_cached_response(key)
+        if cached is not None:
+            return cached
+
     response = generate(prompt, provider=provider, model=provider_model)
     if not response:
         raise RuntimeError("Empty response from LLM provider")
     return response
+
+
+def cache_response(
+    prompt: str,
+    response: str,
+    model: str = DEFAULT_OPENROUTER_MODEL,
+    *,
+    provider: str = "openrouter",
+) -> None:
+    """Cache a response the caller has validated, so the same prompt is answered from it next time.
+
+    Rejected responses are never stored: retry prompts are deterministic, so a
+    cached bad answer would be replayed on every retry and every later run.
+    """
+    if _cache_enabled():
+        provider_model = None if model == DEFAULT_OPENROUTER_MODEL else model
+        _store_cached_response(_cache_key(prompt, provider, provider_model), response)
+
+
+@contextlib.asynccontextmanager
+async def _request_slot():
+    """Hold one of the process-wide request slots without blocking the event loop."""
+    while not _request_slots.acquire(blocking=False):
+        await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        _request_slots.release()
+
+
+async def agenerate(prompt: str, *, provider: str = "openrouter", model: Optional[str] = None, client=None) -> str:
+    if provider not in ("together", "openrouter"):
+        raise ValueError(f"Unsupported provider '{provider}'")
+    async with _request_slot():
+        if provider == "together":
+            return await _agenerate_together(prompt, model=model, client=client)
+        return await _agenerate_openrouter(prompt, model=model, client=client)
+
+
+async def acall_llm(
+    prompt: str,
+    model: str = DEFAULT_OPENROUTER_MODEL,
+    *,
+    provider: str = "openrouter",
+    client=None,
+) -> str:
+    """Async counterpart of call_llm for fanning out many requests concurrently (see cache_response)."""
+    provider_model = None if model == DEFAULT_OPENROUTER_MODEL else model
+    use_cache = _cache_enabled()
+    if use_cache:
+        key = _cache_key(prompt, provider, provider_model)
+        cached = _get_cached_response(key)
+        if cached is not None:
+            return cached
+
+    response = await agenerate(prompt, provider=provider, model=provider_model, client=client)
+    if not response:
+        raise RuntimeError("Empty response from LLM provider")
+    return response
+
+
+async def acall_llm_batch(
+    prompts: List[str],
+    model: str = DEFAULT_OPENROUTER_MODEL,
+    *,
+    provider: str = "openrouter",
+    concurrency: int = 8,
+    client=None,
+) -> List[Union[str, BaseException]]:
+    """Issue many prompts over one shared client so requests reuse its keep-alive connections.
+
+    A client passed in is used as-is and left open for the caller's later requests.
+
+    Results are returned in prompt order; a prompt that failed yields its exception
+    instead of a response so callers can retry it individually. As with call_llm,
+    only responses passed to cache_response() are cached.
+    """
+    provider_model = None if model == DEFAULT_OPENROUTER_MODEL else model
+    use_cache = _cache_enabled()
+    results: List[Union[str, BaseException, None]] = [None] * len(prompts)
+    pending = []
+
+    for i, prompt in enumerate(prompts):
+        cached = _get_cached_response(_cache_key(prompt, provider, provider_model)) if use_cache else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    if not pending:
+        return results  # type: ignore[return-value]
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    owns_client = client is None
+    if owns_client:
+        try:
+            client = make_async_client(provider)
+        except Exception as exc:  # e.g. no API key: every pending prompt fails, none raises
+            for i in pending:
+                results[i] = exc
+            return results  # type: ignore[return-value]
+
+    async def _one(i: int) -> None:
+        async with sem:
+            try:
+                response = await agenerate(prompts[i], provider=provider, model=provider_model, client=client)
+                if not response:
+                    raise RuntimeError("Empty response from LLM provider")
+            except Exception as exc:
+                results[i] = exc
+                return
+        results[i] = response
+
+    try:
+        await asyncio.gather(*[_one(i) for i in pending])
+    finally:
+        if owns_client:
+            await client.close()
+
+    return results  # type: ignore[return-value]
+
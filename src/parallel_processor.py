@@ -1,9 +1,8 @@
 import asyncio
+import functools
 import time
 from typing import List, Callable, Any, Dict, Optional
 from concurrent.futures import ThreadPoolExecutor
-from collections import deque
-import threading
 
 class RateLimiter:
     """Token bucket rate limiter for API calls"""
@@ -15,30 +14,32 @@ class RateLimiter:
         """
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = deque()
-        self.lock = threading.Lock()
+        # Bucket holds up to max_calls tokens, refilled continuously at rate per second
+        self.rate = max_calls / time_window if time_window > 0 else float('inf')
+        self.tokens = float(max_calls)
+        self.last_refill = time.monotonic()
     
     def acquire(self) -> float:
         """
         Attempt to acquire permission to make a call
         Returns: wait time in seconds (0 if can proceed immediately)
+        
+        A call that has to wait still takes its token (the bucket goes negative),
+        so concurrent waiters are spaced out instead of all waking at once.
+        Not locked: the limiter is only used from the event loop's thread, and
+        there is no await between reading and updating the bucket.
         """
-        with self.lock:
-            now = time.time()
-            
-            # Remove calls outside the time window
-            while self.calls and self.calls[0] < now - self.time_window:
-                self.calls.popleft()
-            
-            # Check if we can make a call
-            if len(self.calls) < self.max_calls:
-                self.calls.append(now)
-                return 0.0
-            
-            # Calculate wait time
-            oldest_call = self.calls[0]
-            wait_time = (oldest_call + self.time_window) - now
-            return max(0.0, wait_time)
+        if self.rate == float('inf'):
+            return 0.0
+        
+        now = time.monotonic()
+        self.tokens = min(self.max_calls, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        self.tokens -= 1
+        
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
     
     async def wait_if_needed(self):
         """Async wait for rate limit"""
@@ -52,17 +53,23 @@ class ParallelProcessor:
     
     def __init__(self, max_workers: int = 5, 
                  rate_limit_calls: int = 10, 
-                 rate_limit_window: float = 60.0):
+                 rate_limit_window: float = 60.0,
+                 io_bound: bool = True):
         """
         max_workers: Maximum number of concurrent tasks
         rate_limit_calls: Maximum API calls per time window
         rate_limit_window: Time window for rate limiting in seconds
+        io_bound: Run sync process_func in worker threads (it blocks on I/O such as
+                  API calls); False calls it inline, skipping the thread hop for CPU work
         """
         self.max_workers = max_workers
+        self.io_bound = io_bound
+        # Own pool sized to max_workers (threads start on first use)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
         self.rate_limiter = RateLimiter(rate_limit_calls, rate_limit_window)
         self.results = {}
+        # Only updated on the event loop thread (after each await), so no lock is needed
         self.progress = {"completed": 0, "total": 0, "failed": 0}
-        self.lock = threading.Lock()
     
     async def process_file_async(self, file_path: str, 
                                   process_func: Callable, 
@@ -73,25 +80,28 @@ class ParallelProcessor:
         # Wait for rate limit
         await self.rate_limiter.wait_if_needed()
         
-        # Execute in thread pool (since process_func is sync)
-        loop = asyncio.get_event_loop()
         try:
-            result = await loop.run_in_executor(
-                None, 
-                lambda: process_func(file_path, *args, **kwargs)
-            )
+            if asyncio.iscoroutinefunction(process_func):
+                result = await process_func(file_path, *args, **kwargs)
+            elif self.io_bound:
+                # Blocking sync work goes to the pool so other files proceed meanwhile
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(
+                    self._pool,
+                    functools.partial(process_func, file_path, *args, **kwargs)
+                )
+            else:
+                result = process_func(file_path, *args, **kwargs)
             
-            with self.lock:
-                self.progress["completed"] += 1
-                if not result.success:
-                    self.progress["failed"] += 1
+            self.progress["completed"] += 1
+            if not result.success:
+                self.progress["failed"] += 1
             
             return result
             
         except Exception as e:
-            with self.lock:
-                self.progress["completed"] += 1
-                self.progress["failed"] += 1
+            self.progress["completed"] += 1
+            self.progress["failed"] += 1
             
             # Return a failed result
             from report_generator import FileUpgradeResult
@@ -113,44 +123,44 @@ class ParallelProcessor:
         self.progress["completed"] = 0
         self.progress["failed"] = 0
         
-        # Create tasks
-        tasks = [
-            self.process_file_async(file_path, process_func, *args, **kwargs)
-            for file_path in files
-        ]
-        
-        # Process with limited concurrency
+        # Process with limited concurrency: a file's coroutine (and its rate-limit
+        # wait) is only created once it holds a semaphore slot
         semaphore = asyncio.Semaphore(self.max_workers)
         
-        async def bounded_task(task):
+        async def bounded_task(file_path):
             async with semaphore:
-                return await task
-        
-        bounded_tasks = [bounded_task(task) for task in tasks]
-        
-        # Execute all tasks
-        results = await asyncio.gather(*bounded_tasks, return_exceptions=True)
+                try:
+                    result = await self.process_file_async(file_path, process_func, *args, **kwargs)
+                except Exception as e:
+                    from report_generator import FileUpgradeResult
+                    result = FileUpgradeResult(
+                        file_path=file_path,
+                        success=False,
+                        attempts=0,
+                        api_changes=[],
+                        error=str(e)
+                    )
+                return file_path, result
         
-        # Map results to file paths
-        result_dict = {}
-        for file_path, result in zip(files, results):
-            if isinstance(result, Exception):
-                from report_generator import FileUpgradeResult
-                result = FileUpgradeResult(
-                    file_path=file_path,
-                    success=False,
-                    attempts=0,
-                    api_changes=[],
-                    error=str(result)
-                )
+        # Collect results as they finish so progress shows per file; keys keep
+        # the input order regardless of completion order
+        result_dict = dict.fromkeys(files)
+        for next_done in asyncio.as_completed([bounded_task(f) for f in files]):
+            file_path, result = await next_done
             result_dict[file_path] = result
+            self.print_progress()
+        if files:
+            print()  # end the progress bar line
         
         return result_dict
     
+    def close(self):
+        """Shut down the worker threads"""
+        self._pool.shutdown(wait=True)
+    
     def get_progress(self) -> Dict[str, int]:
         """Get current progress"""
-        with self.lock:
-            return self.progress.copy()
+        return self.progress.copy()
     
     def print_progress(self):
         """Print progress bar"""
@@ -228,7 +238,7 @@ class DependencyBatchProcessor:
             
             # Print summary for this level
             successful = sum(1 for r in results.values() if r.success)
-            print(f"\nLevel {level} complete: {successful}/{len(level_files)} successful")
+            print(f"Level {level} complete: {successful}/{len(level_files)} successful")
         
         return all_results
 
@@ -252,10 +262,16 @@ def run_parallel_upgrade(files: List[str],
             max_workers=max_workers,
             rate_limit_calls=rate_limit_calls
         )
-        return asyncio.run(processor.process_by_levels(files, process_func, *args, **kwargs))
+        try:
+            return asyncio.run(processor.process_by_levels(files, process_func, *args, **kwargs))
+        finally:
+            processor.processor.close()
     else:
         processor = ParallelProcessor(
             max_workers=max_workers,
             rate_limit_calls=rate_limit_calls
         )
-        return asyncio.run(processor.process_batch(files, process_func, *args, **kwargs))
\ No newline at end of file
+        try:
+            return asyncio.run(processor.process_batch(files, process_func, *args, **kwargs))
+        finally:
+            processor.close()
\ No newline at end of file
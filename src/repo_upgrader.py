@@ -1,25 +1,29 @@
 import os
-import shutil
-import agentic_upgrader
+import threading
 import dependency_upgrader
 import report_generator
 from cache_manager import CacheManager
-from dependency_analyzer import DependencyAnalyzer
-from parallel_processor import run_parallel_upgrade
-from typing import List
+from import_scanner import RepoScanner
+from typing import Callable, List, Optional, Union
+from utils import ZipRepoReader, clone_tree, remove_tree_async
 
-def upgrade_repo(old_repo: str, new_repo: str, 
+def upgrade_repo(old_repo: Union[str, ZipRepoReader], new_repo: str, 
                 use_cache: bool = True, 
                 respect_dependencies: bool = True,
                 parallel: bool = True,
-                max_workers: int = 5) -> str:
+                max_workers: int = 5,
+                progress_callback: Optional[Callable[[int, int], None]] = None) -> str:
     """
     Upgrade entire repository with comprehensive reporting and caching
+    old_repo may be a directory or a ZipRepoReader, which is unpacked straight into new_repo
+    progress_callback, if given, is called with (files done, total files) as files
+    finish, from worker threads when processing in parallel
     Returns path to generated report
     """
     
     previous_project_root = os.getenv("ML_UPGRADER_PROJECT_ROOT")
     os.environ["ML_UPGRADER_PROJECT_ROOT"] = new_repo
+    cache = None
 
     try:
         # Initialize components
@@ -28,8 +32,14 @@ def upgrade_repo(old_repo: str, new_repo: str,
         
         # Setup output directory
         if os.path.exists(new_repo):
-            shutil.rmtree(new_repo)
-        shutil.copytree(old_repo, new_repo)
+            remove_tree_async(new_repo)  # previous output is deleted while the copy proceeds
+        if isinstance(old_repo, ZipRepoReader):
+            old_repo.extract_to(new_repo)
+        else:
+            clone_tree(old_repo, new_repo)
+        
+        # One directory walk shared by dependency scanning and file collection
+        scanner = RepoScanner(new_repo, max_workers=max_workers if parallel else 1)
         
         # Initialize cache
         cache = CacheManager(new_repo) if use_cache else None
@@ -43,30 +53,33 @@ def upgrade_repo(old_repo: str, new_repo: str,
         
         # Update dependencies
         print("Updating dependencies...")
-        dep_updater.update_requirements_txt(new_repo)
+        dep_updater.update_requirements_txt(new_repo, scanner)
         dep_updater.update_setup_py(new_repo)
         report_gen.add_dependency_changes(dep_updater.updated_deps)
         
         # Collect Python files
         python_files = []
-        for root, _, files in os.walk(new_repo):
+        for root, _, files in scanner.walk():
             # Skip cache directory
             if cache and cache.cache_dir in root:
                 continue
             
-            for f in files:
-                if f.endswith(".py"):
-                    file_path = os.path.join(root, f)
-                    
-                    # Skip metadata files
-                    if '__pycache__' in file_path or '.pyc' in file_path:
-                        continue
-                    if os.path.basename(file_path).startswith('._'):
-                        continue
-                    if '__MACOSX' in file_path:
-                        continue
-                    
-                    python_files.append(file_path)
+            # Skip metadata files; a marker in root applies to every file in it,
+            # so only the file names need checking below
+            if '__pycache__' in root or '.pyc' in root or '__MACOSX' in root:
+                continue
+            
+            py_files = [f for f in files if f.endswith(".py")]
+            if not py_files:
+                continue
+            # One scan over the joined names; per-name checks only run for the rare
+            # directory that holds a metadata file ('\0' never occurs in a name)
+            joined = '\0' + '\0'.join(py_files)
+            if '\0._' in joined or '__pycache__' in joined or '.pyc' in joined or '__MACOSX' in joined:
+                py_files = [f for f in py_files if not (
+                    f.startswith('._') or '__pycache__' in f or '.pyc' in f or '__MACOSX' in f)]
+            prefix = os.path.join(root, '')
+            python_files.extend([prefix + f for f in py_files])
         
         print(f"Found {len(python_files)} Python files to upgrade")
         
@@ -75,35 +88,52 @@ def upgrade_repo(old_repo: str, new_repo: str,
         skipped_cached = 0
         
         for file_path in python_files:
-            if cache and cache.is_file_cached(file_path):
-                if cache.restore_from_cache(file_path, file_path):
-                    skipped_cached += 1
-                    # Add cached result to report
-                    cached_result = cache.get_cached_result(file_path)
-                    if cached_result:
-                        result = report_generator.FileUpgradeResult(
-                            file_path=file_path,
-                            success=True,
-                            attempts=cached_result.get("attempts", 0),
-                            api_changes=cached_result.get("api_changes", []),
-                            error=None
-                        )
-                        report_gen.add_file_result(result)
-                    continue
+            # One cache lookup per file: validate, restore and fetch the recorded result
+            cached_result = cache.try_restore(file_path, file_path) if cache else None
+            if cached_result is not None:
+                skipped_cached += 1
+                # Add cached result to report
+                result = report_generator.FileUpgradeResult(
+                    file_path=file_path,
+                    success=True,
+                    attempts=cached_result.get("attempts", 0),
+                    api_changes=cached_result.get("api_changes", []),
+                    error=None
+                )
+                report_gen.add_file_result(result)
+                continue
             
             files_to_process.append(file_path)
         
         if skipped_cached > 0:
             print(f"Restored {skipped_cached} files from cache")
         
+        progress_lock = threading.Lock()
+        files_done = skipped_cached
+        
+        def file_done():
+            nonlocal files_done
+            if progress_callback is not None:
+                with progress_lock:
+                    files_done += 1
+                    progress_callback(files_done, len(python_files))
+        
+        if progress_callback is not None:
+            progress_callback(files_done, len(python_files))
+        
         if not files_to_process:
             print("All files already cached, nothing to process")
         else:
             print(f"Processing {len(files_to_process)} files...")
             
+            # Imported here: the LLM client stack takes most of a second to load and
+            # is not needed when every file was restored from cache
+            import agentic_upgrader
+            
             # Analyze dependencies if needed
             dependency_levels = None
             if respect_dependencies and len(files_to_process) > 1:
+                from dependency_analyzer import DependencyAnalyzer
                 analyzer = DependencyAnalyzer(new_repo)
                 dep_stats = analyzer.analyze_repository(files_to_process)
                 print(f"Dependency analysis: {dep_stats['files_with_deps']} files have dependencies")
@@ -111,22 +141,24 @@ def upgrade_repo(old_repo: str, new_repo: str,
             
             # Create wrapper function for parallel processing
             def process_with_cache(file_path: str, output_path: str):
-                result = agentic_upgrader.upgrade_file(file_path, output_path)
-                
-                # Cache result
-                if cache:
-                    if result.success:
-                        with open(file_path, 'r') as f:
-                            upgraded_code = f.read()
-                        cache.cache_result(file_path, result, upgraded_code)
-                    else:
-                        cache.cache_result(file_path, result)
-                
-                return result
+                try:
+                    result = agentic_upgrader.upgrade_file(file_path, output_path)
+                    
+                    # Cache result
+                    if cache:
+                        if result.success:
+                            cache.cache_result(file_path, result, upgraded_path=file_path)
+                        else:
+                            cache.cache_result(file_path, result)
+                    
+                    return result
+                finally:
+                    file_done()  # failed files count too, so progress reaches the total
             
             # Process files
             if parallel and len(files_to_process) > 1:
                 print(f"Using parallel processing with {max_workers} workers")
+                from parallel_processor import run_parallel_upgrade
                 
                 results = run_parallel_upgrade(
                     files_to_process,
@@ -136,9 +168,9 @@ def upgrade_repo(old_repo: str, new_repo: str,
                     rate_limit_calls=int(os.getenv("ML_UPGRADER_RATE_LIMIT", "10"))
                 )
                 
-                # Add results to report
-                for file_path, result in results.items():
-                    report_gen.add_file_result(result)
+                # Add results to report in discovery order (completion order is nondeterministic)
+                for file_path in files_to_process:
+                    report_gen.add_file_result(results[file_path])
             
             else:
                 # Sequential processing (fallback)
@@ -179,6 +211,9 @@ def upgrade_repo(old_repo: str, new_repo: str,
         return report_path
         
     finally:
+        # Persist results batched since the last flush, also when a file or the report failed
+        if cache:
+            cache.flush()
         if previous_project_root is None:
             os.environ.pop("ML_UPGRADER_PROJECT_ROOT", None)
         else:
@@ -4,8 +4,11 @@ Generates comprehensive upgrade reports with statistics and insights
 """
 
 import os
+import time
+from collections import Counter
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from itertools import chain
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 
 
@@ -28,9 +31,13 @@ class ReportGenerator:
     def __init__(self):
         self.results: List[FileUpgradeResult] = []
         self.dependency_changes: List[str] = []
-        self.start_time = datetime.now()
+        self.start_time = datetime.now()  # wall clock, for display
+        self._start_perf = time.perf_counter()  # monotonic, for the duration
         self.total_cost_usd = 0.0
         self.total_tokens = 0
+        # file_path -> path relative to the cwd at report time, filled while writing
+        self._rel_cache: Dict[str, str] = {}
+        self._rel_start = os.curdir
     
     def add_file_result(self, result: FileUpgradeResult):
         """Add a file upgrade result"""
@@ -56,22 +63,35 @@ class ReportGenerator:
             minutes = int((seconds % 3600) / 60)
             return f"{hours}h {minutes}m"
     
-    def _get_file_stats(self) -> Dict[str, Any]:
-        """Calculate file statistics"""
-        successful = [r for r in self.results if r.success]
-        failed = [r for r in self.results if not r.success]
+    def _partition_results(self) -> Tuple[List[FileUpgradeResult], List[FileUpgradeResult]]:
+        """Split results into (successful, failed) in one pass"""
+        successful: List[FileUpgradeResult] = []
+        failed: List[FileUpgradeResult] = []
+        for result in self.results:
+            (successful if result.success else failed).append(result)
+        return successful, failed
+    
+    def _rel_path(self, file_path: str) -> str:
+        """os.path.relpath(file_path) against the cwd captured by generate_report, computed once per path"""
+        rel_path = self._rel_cache.get(file_path)
+        if rel_path is None:
+            rel_path = self._rel_cache[file_path] = os.path.relpath(file_path, self._rel_start)
+        return rel_path
+    
+    def _get_file_stats(
+        self,
+        successful: Optional[List[FileUpgradeResult]] = None,
+        failed: Optional[List[FileUpgradeResult]] = None
+    ) -> Dict[str, Any]:
+        """Calculate file statistics (pass an existing _partition_results() split to reuse it)"""
+        if successful is None or failed is None:
+            successful, failed = self._partition_results()
         
         total_attempts = sum(r.attempts for r in self.results)
         avg_attempts = total_attempts / len(self.results) if self.results else 0
         
         # API change frequency
-        all_changes = []
-        for result in successful:
-            all_changes.extend(result.api_changes)
-        
-        change_counts = {}
-        for change in all_changes:
-            change_counts[change] = change_counts.get(change, 0) + 1
+        change_counts = Counter(chain.from_iterable(result.api_changes for result in successful))
         
         return {
             "total": len(self.results),
@@ -90,33 +110,40 @@ class ReportGenerator:
         Args:
             output_path: Path to save the report
         """
+        duration = time.perf_counter() - self._start_perf
         end_time = datetime.now()
-        duration = (end_time - self.start_time).total_seconds()
         
-        stats = self._get_file_stats()
-        successful = [r for r in self.results if r.success]
-        failed = [r for r in self.results if not r.success]
+        successful, failed = self._partition_results()
+        stats = self._get_file_stats(successful, failed)
         
-        # Build report
-        report = self._build_report_header(end_time, duration, stats)
-        report += self._build_executive_summary(stats, duration)
-        report += self._build_dependency_section()
-        report += self._build_cost_section(duration)
-        report += self._build_successful_upgrades_section(successful)
-        report += self._build_failed_upgrades_section(failed)
-        report += self._build_statistics_section(stats)
-        report += self._build_recommendations_section(successful, failed)
+        # relpath() would otherwise call os.getcwd() for every listed file
+        cwd = os.getcwd()
+        if cwd != self._rel_start:
+            self._rel_cache.clear()
+            self._rel_start = cwd
         
-        # Write report
+        # Stream every section straight into the file; the report is never held as one string
         os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
-        with open(output_path, 'w') as f:
-            f.write(report)
+        with open(output_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            f.writelines(self._iter_report_header(end_time, duration, stats))
+            if not self.results and not self.dependency_changes:
+                # Nothing to summarize: keep the header (its counts are still parsed) and stop
+                f.write("No files were processed and no dependencies changed.\n")
+                print(f"\n📊 Report generated: {output_path}")
+                return
+            f.writelines(self._iter_executive_summary(stats, duration))
+            f.writelines(self._iter_dependency_section())
+            f.writelines(self._iter_cost_section(duration))
+            f.writelines(self._iter_successful_upgrades_section(successful))
+            f.writelines(self._iter_failed_upgrades_section(failed))
+            f.writelines(self._iter_statistics_section(stats))
+            f.writelines(self._iter_recommendations_section(successful, failed))
         
         print(f"\n📊 Report generated: {output_path}")
     
-    def _build_report_header(self, end_time: datetime, duration: float, stats: Dict) -> str:
-        """Build report header section"""
-        return f"""# 🚀 ML Repository Upgrade Report
+    def _iter_report_header(self, end_time: datetime, duration: float, stats: Dict) -> Iterator[str]:
+        """Yield report header section"""
+        yield f"""# 🚀 ML Repository Upgrade Report
 
 **Generated:** {end_time.strftime('%Y-%m-%d %H:%M:%S')}  
 **Duration:** {self._format_duration(duration)}  
@@ -128,11 +155,11 @@ class ReportGenerator:
 
 """
     
-    def _build_executive_summary(self, stats: Dict, duration: float) -> str:
-        """Build executive summary section"""
+    def _iter_executive_summary(self, stats: Dict, duration: float) -> Iterator[str]:
+        """Yield executive summary section"""
         success_emoji = "✅" if stats['success_rate'] > 80 else "⚠️" if stats['success_rate'] > 50 else "❌"
         
-        report = f"""## 📋 Executive Summary
+        yield f"""## 📋 Executive Summary
 
 {success_emoji} **{stats['successful']}/{stats['total']}** files upgraded successfully (**{stats['success_rate']:.1f}%**)
 
@@ -142,33 +169,31 @@ class ReportGenerator:
 - **Total LLM Calls:** {stats['total_attempts']}
 
 """
-        return report
     
-    def _build_dependency_section(self) -> str:
-        """Build dependency updates section"""
+    def _iter_dependency_section(self) -> Iterator[str]:
+        """Yield dependency updates section"""
         if not self.dependency_changes:
-            return ""
+            return
         
-        report = """## 📦 Dependency Updates
+        yield """## 📦 Dependency Updates
 
 The following ML/AI library versions were updated:
 
 """
         for change in self.dependency_changes:
-            report += f"- {change}\n"
+            yield f"- {change}\n"
         
-        report += "\n"
-        return report
+        yield "\n"
     
-    def _build_cost_section(self, duration: float) -> str:
-        """Build cost and resource usage section"""
+    def _iter_cost_section(self, duration: float) -> Iterator[str]:
+        """Yield cost and resource usage section"""
         if self.total_cost_usd == 0:
-            return ""
+            return
         
         cost_per_file = self.total_cost_usd / len(self.results) if self.results else 0
         tokens_per_file = self.total_tokens / len(self.results) if self.results else 0
         
-        return f"""## 💰 Cost Analysis
+        yield f"""## 💰 Cost Analysis
 
 - **Total Cost:** ${self.total_cost_usd:.4f}
 - **Total Tokens:** {self.total_tokens:,}
@@ -178,12 +203,12 @@ The following ML/AI library versions were updated:
 
 """
     
-    def _build_successful_upgrades_section(self, successful: List[FileUpgradeResult]) -> str:
-        """Build successful upgrades section"""
+    def _iter_successful_upgrades_section(self, successful: List[FileUpgradeResult]) -> Iterator[str]:
+        """Yield successful upgrades section"""
         if not successful:
-            return ""
+            return
         
-        report = """## ✅ Successfully Upgraded Files
+        yield """## ✅ Successfully Upgraded Files
 
 """
         
@@ -196,38 +221,38 @@ The following ML/AI library versions were updated:
         for attempts in sorted(by_attempts.keys(), reverse=True):
             results = by_attempts[attempts]
             if attempts > 1:
-                report += f"### Files requiring {attempts} attempts ({len(results)} files)\n\n"
+                yield f"### Files requiring {attempts} attempts ({len(results)} files)\n\n"
             
             for result in results[:10]:  # Limit to 10 files per category
-                rel_path = os.path.relpath(result.file_path)
-                report += f"#### `{rel_path}`\n\n"
+                rel_path = self._rel_path(result.file_path)
+                yield f"#### `{rel_path}`\n\n"
                 
                 if result.api_changes:
-                    report += "**API Changes:**\n"
+                    yield "**API Changes:**\n"
                     for change in result.api_changes:
-                        report += f"- {change}\n"
-                    report += "\n"
+                        yield f"- {change}\n"
+                    yield "\n"
                 
                 if result.diff and attempts > 1:
                     # Show diff for files that needed multiple attempts
-                    report += "<details>\n<summary>View Changes</summary>\n\n```diff\n"
-                    diff_lines = result.diff.split('\n')[:30]
-                    report += '\n'.join(diff_lines)
-                    if len(result.diff.split('\n')) > 30:
-                        report += f"\n... ({len(result.diff.split('\n')) - 30} more lines)"
-                    report += "\n```\n</details>\n\n"
+                    yield "<details>\n<summary>View Changes</summary>\n\n```diff\n"
+                    # Split off only the 30 shown lines; the rest are just counted
+                    diff_lines = result.diff.split('\n', 30)[:30]
+                    yield '\n'.join(diff_lines)
+                    extra = result.diff.count('\n') + 1 - 30
+                    if extra > 0:
+                        yield f"\n... ({extra} more lines)"
+                    yield "\n```\n</details>\n\n"
             
             if len(results) > 10:
-                report += f"*... and {len(results) - 10} more files*\n\n"
-        
-        return report
+                yield f"*... and {len(results) - 10} more files*\n\n"
     
-    def _build_failed_upgrades_section(self, failed: List[FileUpgradeResult]) -> str:
-        """Build failed upgrades section"""
+    def _iter_failed_upgrades_section(self, failed: List[FileUpgradeResult]) -> Iterator[str]:
+        """Yield failed upgrades section"""
         if not failed:
-            return ""
+            return
         
-        report = """## ❌ Failed Upgrades
+        yield """## ❌ Failed Upgrades
 
 The following files could not be automatically upgraded:
 
@@ -236,69 +261,60 @@ The following files could not be automatically upgraded:
         # Group by error type
         by_error = {}
         for result in failed:
-            error_type = result.error.split(':')[0] if result.error else "Unknown"
+            error_type = result.error.partition(':')[0] if result.error else "Unknown"
             by_error.setdefault(error_type, []).append(result)
         
         for error_type, results in sorted(by_error.items(), key=lambda x: len(x[1]), reverse=True):
-            report += f"### {error_type} ({len(results)} files)\n\n"
+            yield f"### {error_type} ({len(results)} files)\n\n"
             
             for result in results[:5]:  # Show first 5 of each type
-                rel_path = os.path.relpath(result.file_path)
-                report += f"- **`{rel_path}`**\n"
-                if result.error:
-                    report += f"  - Error: {result.error}\n"
-                report += f"  - Attempts: {result.attempts}\n"
+                # One formatted piece per listed file
+                error_line = f"  - Error: {result.error}\n" if result.error else ""
+                yield f"- **`{self._rel_path(result.file_path)}`**\n{error_line}  - Attempts: {result.attempts}\n"
             
             if len(results) > 5:
-                report += f"\n*... and {len(results) - 5} more files*\n"
+                yield f"\n*... and {len(results) - 5} more files*\n"
             
-            report += "\n"
-        
-        return report
+            yield "\n"
     
-    def _build_statistics_section(self, stats: Dict) -> str:
-        """Build detailed statistics section"""
-        report = """## 📊 Detailed Statistics
+    def _iter_statistics_section(self, stats: Dict) -> Iterator[str]:
+        """Yield detailed statistics section"""
+        yield """## 📊 Detailed Statistics
 
 """
         
         # API change frequency
         if stats['change_counts']:
-            report += "### Most Common API Migrations\n\n"
-            sorted_changes = sorted(stats['change_counts'].items(), key=lambda x: x[1], reverse=True)
-            
-            for change, count in sorted_changes[:10]:
+            yield "### Most Common API Migrations\n\n"
+            for change, count in stats['change_counts'].most_common(10):
                 pct = count / stats['successful'] * 100 if stats['successful'] > 0 else 0
-                report += f"- **{change}**: {count} files ({pct:.1f}%)\n"
+                yield f"- **{change}**: {count} files ({pct:.1f}%)\n"
             
-            report += "\n"
+            yield "\n"
         
         # Attempt distribution
-        report += "### Upgrade Attempt Distribution\n\n"
-        attempt_dist = {}
-        for result in self.results:
-            attempt_dist[result.attempts] = attempt_dist.get(result.attempts, 0) + 1
+        yield "### Upgrade Attempt Distribution\n\n"
+        attempt_dist = Counter(result.attempts for result in self.results)
         
         for attempts in sorted(attempt_dist.keys()):
             count = attempt_dist[attempts]
             pct = count / stats['total'] * 100 if stats['total'] > 0 else 0
-            report += f"- **{attempts} attempt(s)**: {count} files ({pct:.1f}%)\n"
+            yield f"- **{attempts} attempt(s)**: {count} files ({pct:.1f}%)\n"
         
-        report += "\n"
-        return report
+        yield "\n"
     
-    def _build_recommendations_section(
+    def _iter_recommendations_section(
         self,
         successful: List[FileUpgradeResult],
         failed: List[FileUpgradeResult]
-    ) -> str:
-        """Build recommendations section"""
-        report = """## 💡 Recommendations
+    ) -> Iterator[str]:
+        """Yield recommendations section"""
+        yield """## 💡 Recommendations
 
 """
         
         if successful:
-            report += f"""### ✅ Immediate Actions
+            yield f"""### ✅ Immediate Actions
 1. **Test Upgraded Files**: Run your test suite on the {len(successful)} successfully upgraded files
 2. **Review Critical Changes**: Pay special attention to files that required multiple attempts
 3. **Update Dependencies**: Install the updated dependencies from requirements.txt
@@ -307,7 +323,7 @@ The following files could not be automatically upgraded:
 """
         
         if failed:
-            report += f"""### ⚠️ Manual Review Required
+            yield f"""### ⚠️ Manual Review Required
 {len(failed)} files require manual attention:
 1. Review error messages for each failed file
 2. Consider upgrading dependencies first, then retry
@@ -316,15 +332,13 @@ The following files could not be automatically upgraded:
 
 """
         
-        report += """### 🔄 Next Steps
+        yield """### 🔄 Next Steps
 1. **Version Control**: Commit successful upgrades before manual fixes
 2. **Documentation**: Update your documentation to reflect API changes
 3. **Testing**: Comprehensive testing is essential after migration
 4. **Monitoring**: Monitor for runtime issues after deployment
 
 """
-        
-        return report
 
 
 def generate_upgrade_report(
@@ -166,7 +166,29 @@ def _resolve_bool_option(env_name: str, config_value: Optional[Any], default: bo
     return default
 
 
+def _runtime_section(data: Any, source: str) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    if not isinstance(data, dict):
+        return {}, source, f"Runtime config {source} must be a JSON object"
+
+    runtime_section = data.get("runtime")
+    if runtime_section is not None:
+        if not isinstance(runtime_section, dict):
+            return {}, source, f"Runtime config {source} field 'runtime' must be an object"
+        return runtime_section, source, None
+
+    return data, source, None
+
+
 def _load_runtime_config(project_root: str) -> Tuple[Dict[str, Any], Optional[str], Optional[str]]:
+    # Inline JSON (e.g. from the UI) takes precedence and needs no file at all
+    inline = os.getenv("ML_UPGRADER_RUNTIME_CONFIG_JSON")
+    if inline:
+        source = "ML_UPGRADER_RUNTIME_CONFIG_JSON"
+        try:
+            return _runtime_section(json.loads(inline), source)
+        except json.JSONDecodeError as exc:
+            return {}, source, f"Runtime config parse error in {source}: {exc}"
+
     explicit = os.getenv("ML_UPGRADER_RUNTIME_CONFIG")
     candidate_paths: List[str] = []
 
@@ -190,16 +212,7 @@ def _load_runtime_config(project_root: str) -> Tuple[Dict[str, Any], Optional[st
             except OSError as exc:
                 return {}, path, f"Runtime config read error in {path}: {exc}"
 
-            if not isinstance(data, dict):
-                return {}, path, f"Runtime config {path} must be a JSON object"
-
-            runtime_section = data.get("runtime")
-            if runtime_section is not None:
-                if not isinstance(runtime_section, dict):
-                    return {}, path, f"Runtime config {path} field 'runtime' must be an object"
-                return runtime_section, path, None
-
-            return data, path, None
+            return _runtime_section(data, path)
 
     return {}, None, None
 
@@ -1,7 +1,20 @@
 import os
 import re
+import shutil
 import difflib
-from typing import Dict, List, Tuple, Optional
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Tuple, Optional
+
+try:  # Optional: reflink (copy-on-write) clones on Linux
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# ioctl request from <linux/fs.h>: make dst share src's data blocks (Btrfs, XFS, ...)
+FICLONE = 0x40049409
 
 def read_file(path: str) -> str:
     """Read file content with encoding handling"""
@@ -19,6 +32,139 @@ def write_file(path: str, content: str) -> None:
         f.write(content)
 
 
+def write_parts(path: str, parts: List[str], separator: str = "") -> None:
+    """Write parts joined by separator without materializing the joined string"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for i, part in enumerate(parts):
+            if i:
+                f.write(separator)
+            f.write(part)
+
+
+def remove_tree_async(path: str) -> None:
+    """Move path out of the way at once and delete it on a background thread
+
+    Renaming within the same directory is atomic, so path is free for reuse on
+    return. The thread is non-daemon: the interpreter finishes the delete
+    before exiting. Falls back to a blocking rmtree if the rename fails.
+    """
+    path = os.path.normpath(path)
+    trash = f"{path}.trash.{os.getpid()}.{time.time_ns()}"
+    try:
+        os.rename(path, trash)
+    except OSError:
+        shutil.rmtree(path)
+        return
+    threading.Thread(target=shutil.rmtree, args=(trash,), kwargs={"ignore_errors": True},
+                     name="remove-tree", daemon=False).start()
+
+
+def clone_tree(src: str, dst: str) -> None:
+    """shutil.copytree(src, dst), sharing file data via reflinks where the filesystem allows
+
+    Cloned files are copy-on-write, so later in-place writes to dst never
+    touch src. Falls back to regular copies once cloning is unsupported.
+    """
+    can_clone = fcntl is not None and hasattr(os, "uname") and os.uname().sysname == "Linux"
+
+    def clone_file(src_file: str, dst_file: str) -> str:
+        nonlocal can_clone
+        if can_clone:
+            try:
+                with open(src_file, "rb") as fsrc, open(dst_file, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                can_clone = False  # e.g. ext4/tmpfs or a cross-device copy; stop trying
+            else:
+                shutil.copystat(src_file, dst_file)
+                return dst_file
+        return shutil.copy2(src_file, dst_file)
+
+    shutil.copytree(src, dst, copy_function=clone_file)
+
+
+class LRUCache:
+    """Thread-safe mapping that drops its least recently used entries beyond maxsize
+
+    For module-level caches in long-lived processes (the Streamlit server),
+    which would otherwise hold entries for every deleted temp tree.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class ZipRepoReader:
+    """Read a zipped repository member by member, without a temp extraction"""
+
+    def __init__(self, zip_path: str):
+        self.zip_path = zip_path
+
+    def __str__(self) -> str:
+        return self.zip_path
+
+    def __iter__(self) -> Iterator[Tuple[str, bytes]]:
+        """Yield (member name, content bytes) for every file in the archive"""
+        with zipfile.ZipFile(self.zip_path, "r") as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                with zf.open(info) as fh:
+                    yield info.filename, fh.read()
+
+    def extract_to(self, dest: str, skip: Optional[Callable[[str], bool]] = None) -> None:
+        """Stream every member straight into dest (skipping paths that escape it)
+
+        skip, if given, is called with each member name and returns True for
+        members to leave out. Files keep their archived modification times, as
+        with unzip, so mtime-keyed caches see when they were last edited.
+        """
+        root = os.path.realpath(dest)
+        os.makedirs(root, exist_ok=True)
+        with zipfile.ZipFile(self.zip_path, "r") as zf:
+            for info in zf.infolist():
+                if skip is not None and skip(info.filename):
+                    continue
+                target = os.path.realpath(os.path.join(root, info.filename))
+                if target != root and not target.startswith(root + os.sep):
+                    continue
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zf.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+                try:
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    os.utime(target, (mtime, mtime))
+                except (OverflowError, ValueError, OSError):
+                    pass  # keep the extraction time
+
+
 def is_probably_binary(path: str, sample_size: int = 2048) -> bool:
     """Heuristic to detect binary files (null bytes or low text ratio)."""
     try:
@@ -133,12 +279,10 @@ def build_prompt(code: str, error: Optional[str] = None) -> str:
             f"{code}\n"
         )
 
-def extract_api_changes(old_code: str, new_code: str) -> List[str]:
-    """Extract API changes between old and new code"""
-    changes = []
-    
-    # Common API patterns to detect
-    patterns = {
+# Common API patterns to detect, compiled once instead of on every call
+_API_CHANGE_PATTERNS = [
+    (re.compile(pattern), description)
+    for pattern, description in {
         r'tf\.Session\(\)': 'Removed tf.Session (TF 1.x → 2.x)',
         r'tf\.placeholder': 'Replaced tf.placeholder with tf.Variable or function parameters',
         r'np\.asscalar': 'Replaced np.asscalar with .item()',
@@ -149,16 +293,24 @@ def extract_api_changes(old_code: str, new_code: str) -> List[str]:
         r'np\.int\b': 'Replaced np.int with int',
         r'np\.float\b': 'Replaced np.float with float',
         r'torch\.autograd\.Variable': 'Removed torch.autograd.Variable (no longer needed)',
-    }
+    }.items()
+]
+
+def extract_api_changes(old_code: str, new_code: str) -> List[str]:
+    """Extract API changes between old and new code"""
+    changes = []
     
-    for pattern, description in patterns.items():
-        if re.search(pattern, old_code) and not re.search(pattern, new_code):
+    for pattern, description in _API_CHANGE_PATTERNS:
+        if pattern.search(old_code) and not pattern.search(new_code):
             changes.append(description)
     
     return changes
 
 def generate_diff(old_content: str, new_content: str, filename: str) -> str:
     """Generate unified diff between old and new content"""
+    if old_content == new_content:
+        # Nothing to diff; skip splitting and SequenceMatcher setup entirely
+        return ''
     diff = difflib.unified_diff(
         old_content.splitlines(keepends=True),
         new_content.splitlines(keepends=True),
@@ -19,24 +19,39 @@ def validate_syntax(code: str) -> Tuple[bool, Optional[str]]:
         return False, f"Syntax error: {exc}"
 
 
-def validate_code(file_path: str) -> Tuple[bool, Optional[str]]:
-    """Validate code with syntax and basic runtime checks"""
+def validate_code(
+    file_path: Optional[str] = None,
+    source: Optional[str] = None,
+    tree: Optional[ast.AST] = None,
+) -> Tuple[bool, Optional[str]]:
+    """Validate code with syntax and basic runtime checks
+
+    Pass ``source`` (and/or an already parsed ``tree``) to skip re-reading and
+    re-parsing the file. Without ``file_path`` only the syntax check runs.
+    """
     # First check syntax
-    try:
-        code = open(file_path, "r", encoding="utf-8").read()
-        is_valid, error = validate_syntax(code)
+    if tree is None:
+        if source is None:
+            if file_path is None:
+                return False, "No file path or source provided"
+            try:
+                with open(file_path, "r", encoding="utf-8") as handle:
+                    source = handle.read()
+            except UnicodeDecodeError:
+                try:
+                    with open(file_path, "r", encoding="latin-1") as handle:
+                        source = handle.read()
+                except Exception as exc:
+                    return False, f"File read error: {exc}"
+            except Exception as exc:
+                return False, f"File read error: {exc}"
+
+        is_valid, error = validate_syntax(source)
         if not is_valid:
             return False, error
-    except UnicodeDecodeError:
-        try:
-            code = open(file_path, "r", encoding="latin-1").read()
-            is_valid, error = validate_syntax(code)
-            if not is_valid:
-                return False, error
-        except Exception as exc:
-            return False, f"File read error: {exc}"
-    except Exception as exc:
-        return False, f"File read error: {exc}"
+
+    if file_path is None:
+        return True, None
 
     # Compile check
     try:
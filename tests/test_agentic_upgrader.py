@@ -0,0 +1,34 @@
+"""
+Tests for chunk post-processing in the agentic upgrader
+"""
+
+from agentic_upgrader import _strip_leading_imports
+
+
+class TestStripLeadingImports:
+    
+    HEADER = "import os\nimport numpy as np\nfrom typing import List"
+    
+    def test_literal_header_is_stripped(self):
+        """The header we prepended comes back verbatim"""
+        code = self.HEADER + "\n\ndef f():\n    return os.sep\n"
+        
+        assert _strip_leading_imports(code, self.HEADER) == "def f():\n    return os.sep"
+    
+    def test_reordered_header_is_stripped(self):
+        """The LLM reordered and regrouped the header"""
+        code = "from typing import List\nimport os\n\nimport numpy as np\n\ndef f():\n    return np.zeros(1)\n"
+        
+        assert _strip_leading_imports(code, self.HEADER) == "def f():\n    return np.zeros(1)"
+    
+    def test_added_imports_are_kept(self):
+        """Imports the LLM introduced are not in the original header, so they stay"""
+        code = "import os\nimport warnings\nimport numpy as np\nfrom typing import List\n\nwarnings.warn('x')\n"
+        
+        assert _strip_leading_imports(code, self.HEADER) == "import warnings\n\nwarnings.warn('x')"
+    
+    def test_unparseable_output_is_returned_as_is(self):
+        """Without a parse there is nothing safe to drop"""
+        code = "\nimport numpy as np\ndef f(:\n"
+        
+        assert _strip_leading_imports(code, self.HEADER) == "import numpy as np\ndef f(:"
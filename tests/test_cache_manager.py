@@ -0,0 +1,67 @@
+"""
+Tests for batched persistence of the upgrade cache
+"""
+
+import gc
+import os
+
+import pytest
+
+import cache_manager
+from cache_manager import CacheManager
+from report_generator import FileUpgradeResult
+
+
+class TestCacheFlushing:
+
+    @pytest.fixture
+    def repo(self, tmp_path, monkeypatch):
+        """Repo with a few source files and a flush every 3 results"""
+        monkeypatch.setenv("ML_UPGRADER_CACHE_FLUSH_EVERY", "3")
+        for name in ("a.py", "b.py", "c.py", "d.py"):
+            (tmp_path / name).write_text(f"# {name}\n")
+        return str(tmp_path)
+
+    def _record(self, cache, repo, name):
+        path = os.path.join(repo, name)
+        cache.cache_result(path, FileUpgradeResult(file_path=path, success=True, attempts=1, api_changes=[]))
+
+    def test_results_are_written_in_batches(self, repo):
+        """Nothing hits disk until flush_every results have been recorded"""
+        cache = CacheManager(repo)
+
+        self._record(cache, repo, "a.py")
+        self._record(cache, repo, "b.py")
+        assert not os.path.exists(cache.cache_file)
+
+        self._record(cache, repo, "c.py")
+        assert os.path.exists(cache.cache_file)
+        assert CacheManager(repo).get_stats()["total_cached"] == 3
+
+    def test_flush_writes_the_remainder(self, repo):
+        """flush() persists results recorded since the last batch"""
+        cache = CacheManager(repo)
+        for name in ("a.py", "b.py", "c.py", "d.py"):
+            self._record(cache, repo, name)
+        assert CacheManager(repo).get_stats()["total_cached"] == 3
+
+        cache.flush()
+        assert CacheManager(repo).get_stats()["total_cached"] == 4
+
+    def test_exit_hook_flushes_live_managers(self, repo):
+        """The atexit hook writes what a manager never flushed itself"""
+        cache = CacheManager(repo)
+        self._record(cache, repo, "a.py")
+        assert not os.path.exists(cache.cache_file)
+
+        cache_manager._flush_live_managers()
+        assert CacheManager(repo).get_stats()["total_cached"] == 1
+
+    def test_finished_managers_are_not_pinned(self, repo):
+        """The exit hook holds managers weakly, so a dropped one is freed"""
+        cache = CacheManager(repo)
+        assert cache in cache_manager._live_managers
+
+        del cache
+        gc.collect()
+        assert all(manager.repo_path != repo for manager in cache_manager._live_managers)
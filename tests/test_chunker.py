@@ -0,0 +1,107 @@
+"""
+Tests for splitting large files into LLM-sized chunks
+"""
+
+import ast
+
+import pytest
+
+import chunker
+from chunker import CodeChunker, count_tokens
+
+
+def _function(name: str, body_lines: int) -> str:
+    body = "\n".join(f"    value_{i} = {i} * 2" for i in range(body_lines))
+    return f"def {name}():\n{body}\n    return value_0"
+
+
+class TestCodeChunker:
+
+    @pytest.fixture(autouse=True)
+    def estimated_tokens(self, monkeypatch):
+        """Use the len/4 estimate so budgets do not depend on an installed tiktoken"""
+        monkeypatch.setattr(chunker, "tiktoken", None)
+        chunker._get_encoder.cache_clear()
+        yield
+        chunker._get_encoder.cache_clear()
+
+    @pytest.fixture
+    def source(self):
+        """Imports, many small functions and one function far over any budget"""
+        parts = ["import os\nfrom typing import List"]
+        parts.extend(_function(f"small_{i}", 3) for i in range(12))
+        parts.append(_function("huge", 200))
+        parts.append(_function("tail", 2))
+        return "\n\n\n".join(parts) + "\n"
+
+    def test_len_over_four_fallback(self):
+        """Without tiktoken, tokens are estimated as ceil(len / 4)"""
+        assert chunker._get_encoder("openai/gpt-4o-mini") is None
+        assert count_tokens("") == 0
+        assert count_tokens("abcd") == 1
+        assert count_tokens("abcde") == 2
+
+    def test_chunks_are_slices_of_the_source(self, source):
+        """Every chunk is exactly its line range of the original file"""
+        lines = source.split("\n")
+        chunks = CodeChunker(max_lines=50, max_tokens=200).chunk_by_functions(source, "big.py")
+
+        for chunk in chunks:
+            assert chunk["code"] == "\n".join(lines[chunk["start_line"]:chunk["end_line"]])
+            assert chunk["imports"] == "import os\nfrom typing import List"
+
+    def test_chunks_reassemble_every_definition(self, source):
+        """Joined in order, the chunks reproduce each top-level definition"""
+        tree = ast.parse(source)
+        chunks = CodeChunker(max_lines=50, max_tokens=200).chunk_by_functions(source, "big.py")
+        joined = "\n".join(chunk["code"] for chunk in chunks)
+
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef):
+                assert ast.get_source_segment(source, node) in joined
+        huge = [chunk for chunk in chunks if chunk["type"] == "partial"]
+        assert len(huge) > 1
+        assert "\n".join(chunk["code"] for chunk in huge) == _function("huge", 200)
+
+    def test_chunks_stay_within_budget(self, source):
+        """Neither the token nor the line budget is exceeded, and small functions are packed"""
+        chunks = CodeChunker(max_lines=50, max_tokens=200).chunk_by_functions(source, "big.py")
+
+        for chunk in chunks:
+            assert count_tokens(chunk["code"]) <= 200
+            assert chunk["end_line"] - chunk["start_line"] <= 50
+        assert any(chunk["type"] == "group" for chunk in chunks)
+
+    def test_line_fallback_reassembles_source(self):
+        """Unparseable code is split by lines, and the pieces join back to the input"""
+        code = "\n".join(f"x_{i} = (" if i % 7 == 0 else f"y_{i} = {i}" for i in range(120))
+        chunks = CodeChunker(max_lines=25, max_tokens=60).chunk_by_functions(code, "broken.py")
+
+        assert len(chunks) > 1
+        assert all(chunk["type"] == "partial" and chunk["imports"] == "" for chunk in chunks)
+        assert "\n".join(chunk["code"] for chunk in chunks) == code
+        for chunk in chunks:
+            assert count_tokens(chunk["code"]) <= 60
+            assert chunk["end_line"] - chunk["start_line"] <= 25
+
+    def test_given_tree_is_reused(self, source, monkeypatch):
+        """With tree= the source is not parsed again, and the chunks are the same"""
+        expected = CodeChunker(max_lines=50, max_tokens=200).chunk_by_functions(source, "big.py")
+        tree = ast.parse(source)
+
+        def no_parse(*args, **kwargs):
+            raise AssertionError("ast.parse called despite tree=")
+
+        monkeypatch.setattr(chunker.ast, "parse", no_parse)
+        chunks = CodeChunker(max_lines=50, max_tokens=200).chunk_by_functions(source, "big.py", tree=tree)
+
+        assert chunks == expected
+
+    def test_file_without_definitions_is_one_chunk(self):
+        """Module-level code only: the whole file is a single chunk"""
+        code = "import os\nprint(os.sep)\n"
+        chunks = CodeChunker().chunk_by_functions(code, "script.py")
+
+        assert len(chunks) == 1
+        assert chunks[0]["type"] == "full"
+        assert chunks[0]["code"] == code
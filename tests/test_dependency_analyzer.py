@@ -0,0 +1,132 @@
+"""
+Tests for dependency ordering of repository files
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from dependency_analyzer import DependencyAnalyzer
+
+
+class TestDependencyAnalyzer:
+    """Test suite for DependencyAnalyzer"""
+
+    @pytest.fixture
+    def temp_repo(self):
+        """Create a temporary repository directory"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def create_files(self, repo: str, files: dict) -> list:
+        """Helper to write files and return their paths"""
+        paths = []
+        for relative_path, content in files.items():
+            file_path = os.path.join(repo, relative_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w') as f:
+                f.write(content)
+            paths.append(file_path)
+        return paths
+
+    def test_upgrade_order_puts_dependencies_first(self, temp_repo):
+        """Files come after everything they import"""
+        paths = self.create_files(temp_repo, {
+            "app.py": "import models\nimport utils\n",
+            "models.py": "import utils\n",
+            "utils.py": "import os\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        order = [os.path.basename(f) for f in analyzer.get_upgrade_order()]
+
+        assert order == ["utils.py", "models.py", "app.py"]
+
+    def test_dependency_levels(self, temp_repo):
+        """Levels count the longest chain of local dependencies"""
+        paths = self.create_files(temp_repo, {
+            "app.py": "import models\nimport utils\n",
+            "models.py": "import utils\n",
+            "utils.py": "import os\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        levels = {os.path.basename(f): level for f, level in analyzer.get_dependency_levels().items()}
+
+        assert levels == {"utils.py": 0, "models.py": 1, "app.py": 2}
+
+    def test_cycles_are_appended(self, temp_repo):
+        """Files in an import cycle are still returned"""
+        paths = self.create_files(temp_repo, {
+            "a.py": "import b\n",
+            "b.py": "import a\n",
+            "c.py": "import os\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        order = [os.path.basename(f) for f in analyzer.get_upgrade_order()]
+
+        assert order[0] == "c.py"
+        assert sorted(order) == ["a.py", "b.py", "c.py"]
+
+    def test_detect_cycles(self, temp_repo):
+        """Cycles are reported as closed paths"""
+        paths = self.create_files(temp_repo, {
+            "a.py": "import b\n",
+            "b.py": "import c\n",
+            "c.py": "import a\n",
+            "d.py": "import a\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        cycles = [[os.path.basename(f) for f in cycle] for cycle in analyzer._detect_cycles()]
+
+        assert len(cycles) == 1
+        assert cycles[0][0] == cycles[0][-1]
+        assert sorted(cycles[0][:-1]) == ["a.py", "b.py", "c.py"]
+
+    def test_cycle_levels_come_last(self, temp_repo):
+        """Files in an import cycle are scheduled after resolvable files"""
+        paths = self.create_files(temp_repo, {
+            "a.py": "import b\nimport c\n",
+            "b.py": "import a\n",
+            "c.py": "import os\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        levels = {os.path.basename(f): level for f, level in analyzer.get_dependency_levels().items()}
+
+        assert levels["c.py"] == 0
+        assert levels["a.py"] == levels["b.py"] > levels["c.py"]
+
+    def test_cycle_dependents_come_after_the_cycle(self, temp_repo):
+        """Only cycle members share a level; files importing the cycle follow it"""
+        paths = self.create_files(temp_repo, {
+            "a.py": "import b\n",
+            "b.py": "import a\n",
+            "c.py": "import a\n",
+            "e.py": "import c\n",
+        })
+        analyzer = DependencyAnalyzer(temp_repo)
+        analyzer.analyze_repository(paths)
+
+        levels = {os.path.basename(f): level for f, level in analyzer.get_dependency_levels().items()}
+
+        assert levels["a.py"] == levels["b.py"]
+        assert levels["c.py"] == levels["a.py"] + 1
+        assert levels["e.py"] == levels["a.py"] + 2
+
+    def test_module_name_keeps_py_inside_names(self, temp_repo):
+        """Only the trailing .py extension is stripped from module names"""
+        analyzer = DependencyAnalyzer(temp_repo)
+
+        assert analyzer._get_module_name(os.path.join(temp_repo, "pytools", "copy.py")) == "pytools.copy"
+        assert analyzer._get_module_name(os.path.join(temp_repo, "pkg", "__init__.py")) == "pkg"
@@ -3,24 +3,21 @@ Comprehensive tests for entry point discovery system
 """
 
 import pytest
-import tempfile
 import os
-import shutil
 from pathlib import Path
 
 # Assuming the module is importable
 from entrypoint_discovery import EntryPointDiscovery, EntryPoint
+from import_scanner import RepoScanner
 
 
 class TestEntryPointDiscovery:
     """Test suite for entry point discovery"""
     
     @pytest.fixture
-    def temp_project(self):
-        """Create a temporary project directory"""
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
+    def temp_project(self, tmp_path):
+        """Create a temporary project directory (pytest removes old ones in bulk)"""
+        return str(tmp_path)
     
     def create_file(self, project_root: str, relative_path: str, content: str):
         """Helper to create files in temp project"""
@@ -59,7 +56,7 @@ pytest tests/
         assert "pytest tests/" in commands
         
         # Check confidence levels
-        train_entry = next(e for e in entries if "train.py" in e.command)
+        train_entry = discovery.by_command["python train.py --epochs 10"]
         assert train_entry.confidence > 0.8
         assert train_entry.type == "python"
     
@@ -80,7 +77,7 @@ Run `python main.py` to start the application.
         commands = [e.command for e in entries]
         assert "python main.py" in commands
         
-        main_entry = next(e for e in entries if e.command == "python main.py")
+        main_entry = discovery.by_command["python main.py"]
         assert main_entry.confidence < 0.9  # Inline code has lower confidence
     
     def test_discover_common_entry_files(self, temp_project):
@@ -99,7 +96,7 @@ Run `python main.py` to start the application.
         assert "python app.py" in commands
         
         # main.py should have highest confidence
-        main_entry = next(e for e in entries if "main.py" in e.command)
+        main_entry = discovery.by_command["python main.py"]
         assert main_entry.confidence >= 0.85
     
     def test_detect_pytest_framework(self, temp_project):
@@ -114,7 +111,7 @@ Run `python main.py` to start the application.
         commands = [e.command for e in entries]
         assert "pytest" in commands
         
-        pytest_entry = next(e for e in entries if e.command == "pytest")
+        pytest_entry = discovery.by_command["pytest"]
         assert pytest_entry.type == "pytest"
         assert pytest_entry.confidence > 0.8
     
@@ -162,9 +159,26 @@ setup(
         assert "mytool" in commands
         
         # Console scripts should have very high confidence
-        myapp_entry = next(e for e in entries if e.command == "myapp")
+        myapp_entry = discovery.by_command["myapp"]
         assert myapp_entry.confidence >= 0.9
     
+    @pytest.mark.parametrize("setup_content", [
+        # INI-style string, which a regex over the source cannot read
+        "from setuptools import setup\nsetup(entry_points='''\n[console_scripts]\nmyapp = pkg.cli:main\n''')\n",
+        # Not a literal: falls back to matching the source
+        "import setuptools\nentry_points = {'console_scripts': ['myapp=pkg.cli:main']}\nsetuptools.setup(entry_points=entry_points)\n",
+        # Python 2 syntax: falls back to matching the source
+        "print 'building'\nsetup(entry_points={'console_scripts': ['myapp=pkg.cli:main']})\n",
+    ])
+    def test_parse_setup_py_variants(self, temp_project, setup_content):
+        """console_scripts are found whatever form entry_points takes"""
+        self.create_file(temp_project, "setup.py", setup_content)
+        
+        discovery = EntryPointDiscovery(temp_project)
+        discovery.discover_all()
+        
+        assert "myapp" in discovery.by_command
+    
     def test_confidence_scoring(self, temp_project):
         """Test that confidence scoring works correctly"""
         readme_content = """
@@ -214,6 +228,26 @@ python main.py
         main_entries = [e for e in entries if e.command.strip() == "python main.py"]
         assert len(main_entries) == 1
     
+    def test_deduplication_ignores_spacing(self, temp_project):
+        """Commands differing only in whitespace are one entry; different arguments are not"""
+        readme_content = """
+```bash
+python   main.py
+python train.py --epochs 10
+python train.py --epochs 1
+```
+        """
+        
+        self.create_file(temp_project, "README.md", readme_content)
+        self.create_file(temp_project, "main.py", "# Main")
+        
+        discovery = EntryPointDiscovery(temp_project)
+        commands = [' '.join(e.command.split()) for e in discovery.discover_all()]
+        
+        assert commands.count("python main.py") == 1
+        assert "python train.py --epochs 10" in commands
+        assert "python train.py --epochs 1" in commands
+    
     def test_example_keyword_boost(self, temp_project):
         """Test that commands near 'example' keywords get confidence boost"""
         readme_content = """
@@ -233,10 +267,10 @@ python config_tool.py
         self.create_file(temp_project, "README.md", readme_content)
         
         discovery = EntryPointDiscovery(temp_project)
-        entries = discovery.discover_all()
+        discovery.discover_all()
         
-        demo_entry = next(e for e in entries if "demo.py" in e.command)
-        config_entry = next(e for e in entries if "config_tool.py" in e.command)
+        demo_entry = discovery.by_command["python demo.py"]
+        config_entry = discovery.by_command["python config_tool.py"]
         
         # Demo should have slightly higher confidence due to "Example" keyword
         assert demo_entry.confidence >= config_entry.confidence
@@ -312,6 +346,41 @@ bash setup.sh
         shell_entries = [e for e in entries if e.type == "shell"]
         assert len(shell_entries) >= 2
     
+    def test_line_matching_several_patterns_uses_best(self, temp_project):
+        """A line matching several patterns takes the highest-confidence one"""
+        readme_content = """
+```bash
+pytest -q && python -m pkg.cli
+```
+        """
+        
+        self.create_file(temp_project, "README.md", readme_content)
+        
+        discovery = EntryPointDiscovery(temp_project)
+        discovery.discover_all()
+        
+        entry = discovery.by_command["pytest -q && python -m pkg.cli"]
+        assert entry.type == "python"
+        assert entry.confidence == 0.9
+    
+    def test_inline_code_after_fenced_block(self, temp_project):
+        """Backticks of fenced blocks are not paired with inline code"""
+        readme_content = """
+```bash
+python train.py
+```
+Then run `python eval.py` to score the model.
+        """
+        
+        self.create_file(temp_project, "README.md", readme_content)
+        
+        discovery = EntryPointDiscovery(temp_project)
+        entries = discovery.discover_all()
+        
+        commands = [e.command for e in entries]
+        assert "python eval.py" in commands
+        assert all('\n' not in command for command in commands)
+    
     def test_no_entry_points_found(self, temp_project):
         """Test behavior when no entry points are found"""
         # Empty project
@@ -372,6 +441,22 @@ torch>=2.0.0
         
         commands = [e.command for e in entries]
         assert "pytest" in commands
+    
+    def test_shared_scanner_matches_own_walk(self, temp_project):
+        """A shared RepoScanner listing finds the same READMEs and entry points"""
+        self.create_file(temp_project, "README.md", "```bash\npython main.py\n```\n")
+        self.create_file(temp_project, "docs/README.rst", "Run `python docs/demo.py`\n")
+        self.create_file(temp_project, ".hidden/README.md", "```bash\npython hidden.py\n```\n")
+        self.create_file(temp_project, "node_modules/pkg/README.md", "```bash\npython vendored.py\n```\n")
+        self.create_file(temp_project, "tests/test_a.py", "import unittest\n")
+        
+        own = EntryPointDiscovery(temp_project)
+        shared = EntryPointDiscovery(temp_project, scanner=RepoScanner(temp_project))
+        
+        assert shared._find_readme_files() == own._find_readme_files()
+        assert len(own._find_readme_files()) == 2
+        assert shared._has_unittest() and own._has_unittest()
+        assert [e.command for e in shared.discover_all()] == [e.command for e in own.discover_all()]
 
 
 class TestEntryPointObject:
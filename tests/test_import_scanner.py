@@ -0,0 +1,59 @@
+"""
+Tests for finding imports in files that do not parse
+"""
+
+import tokenize
+
+import pytest
+
+from import_scanner import _token_imports, scan_imports
+
+
+# Python 2 source: ast.parse rejects it, the token stream still shows the imports
+LEGACY_SOURCE = '''import os, sys
+from collections import OrderedDict
+print "import fake"
+if True: import json
+x = 1; from . import sibling
+from ..pkg import (a,
+    b)
+try:
+    import cPickle as pickle
+except ImportError, e:
+    pass
+'''
+
+LEGACY_IMPORTS = (
+    (None, 0, ('os', 'sys')),
+    ('collections', 0, ('OrderedDict',)),
+    (None, 0, ('json',)),
+    (None, 1, ('sibling',)),
+    ('pkg', 2, ('a', 'b')),
+    (None, 0, ('cPickle',)),
+)
+
+
+class TestTokenImports:
+
+    def test_imports_of_unparseable_source(self):
+        """Statement-start imports are found; the one inside a string is not"""
+        assert _token_imports(LEGACY_SOURCE) == LEGACY_IMPORTS
+
+    def test_untokenizable_source_raises(self):
+        """An unclosed bracket cannot be tokenized at all"""
+        with pytest.raises(tokenize.TokenError):
+            _token_imports("import os\ndef f(:\n")
+
+    def test_scan_imports_falls_back_to_tokens(self, tmp_path):
+        """scan_imports uses the token stream when the file has a syntax error"""
+        path = tmp_path / "legacy.py"
+        path.write_text(LEGACY_SOURCE)
+
+        assert scan_imports(str(path)) == LEGACY_IMPORTS
+
+    def test_scan_imports_of_untokenizable_file_is_empty(self, tmp_path):
+        """A file neither parser can read yields no imports instead of raising"""
+        path = tmp_path / "broken.py"
+        path.write_text("import os\ndef f(:\n")
+
+        assert scan_imports(str(path)) == ()
@@ -0,0 +1,83 @@
+"""
+Tests for the LLM response cache
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import agentic_upgrader
+import llm_interface
+
+
+class TestResponseCache:
+
+    @pytest.fixture
+    def fake_llm(self, tmp_path, monkeypatch):
+        """Route the providers to a canned response and the disk cache into tmp_path"""
+        monkeypatch.setenv("ML_UPGRADER_LLM_CACHE", "1")
+        monkeypatch.setenv("ML_UPGRADER_LLM_CACHE_DIR", str(tmp_path))
+        llm_interface._response_cache.clear()
+        calls = []
+
+        def generate(prompt, provider="openrouter", model=None):
+            calls.append(prompt)
+            return f"response to {prompt}"
+
+        monkeypatch.setattr(llm_interface, "generate", generate)
+        yield calls
+        llm_interface._response_cache.clear()
+
+    def _cached_files(self, root):
+        return [os.path.join(d, f) for d, _, files in os.walk(root) for f in files]
+
+    def test_disk_round_trip(self, fake_llm, tmp_path):
+        """A stored response is served from disk once the memory cache is gone"""
+        response = llm_interface.call_llm("upgrade me")
+        llm_interface.cache_response("upgrade me", response)
+        assert len(self._cached_files(tmp_path)) == 1
+
+        llm_interface._response_cache.clear()
+        assert llm_interface.call_llm("upgrade me") == "response to upgrade me"
+        assert fake_llm == ["upgrade me"]
+
+    def test_unconfirmed_responses_are_not_stored(self, fake_llm, tmp_path):
+        """call_llm alone caches nothing; the same prompt goes back to the provider"""
+        llm_interface.call_llm("upgrade me")
+        llm_interface.call_llm("upgrade me")
+
+        assert fake_llm == ["upgrade me", "upgrade me"]
+        assert self._cached_files(tmp_path) == []
+
+    def test_cache_disabled(self, fake_llm, tmp_path, monkeypatch):
+        """ML_UPGRADER_LLM_CACHE=0 neither stores nor serves responses"""
+        monkeypatch.setenv("ML_UPGRADER_LLM_CACHE", "0")
+        llm_interface.cache_response("upgrade me", "stale")
+
+        assert llm_interface.call_llm("upgrade me") == "response to upgrade me"
+        assert self._cached_files(tmp_path) == []
+
+    def test_only_validated_chunk_response_is_stored(self, tmp_path, monkeypatch):
+        """A chunk answer that fails the syntax check is retried and never cached"""
+        monkeypatch.setenv("ML_UPGRADER_LLM_CACHE", "1")
+        monkeypatch.setenv("ML_UPGRADER_LLM_CACHE_DIR", str(tmp_path))
+        llm_interface._response_cache.clear()
+
+        async def agenerate(prompt, provider="openrouter", model=None, client=None):
+            return "def f():\n    return 2\n"
+
+        monkeypatch.setattr(llm_interface, "agenerate", agenerate)
+        chunk = {"name": "f", "type": "function", "code": "def f():\n    return 1\n", "imports": ""}
+
+        code, _, attempts, success = asyncio.run(
+            agentic_upgrader._upgrade_chunk(0, 1, chunk, 3, first_response="def f(:\n")
+        )
+        llm_interface._response_cache.clear()
+
+        assert success and attempts == 2
+        assert code == "def f():\n    return 2"
+        cached = self._cached_files(tmp_path)
+        assert len(cached) == 1
+        with open(cached[0], encoding="utf-8") as fh:
+            assert fh.read() == "def f():\n    return 2\n"
@@ -0,0 +1,88 @@
+"""
+Tests for the token bucket that spaces out LLM calls
+"""
+
+import asyncio
+
+import pytest
+
+import parallel_processor
+from parallel_processor import RateLimiter
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when told to"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class TestRateLimiter:
+
+    @pytest.fixture
+    def clock(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(parallel_processor.time, "monotonic", clock)
+        return clock
+
+    def test_burst_up_to_max_calls_is_free(self, clock):
+        """A full bucket lets max_calls calls through without waiting"""
+        limiter = RateLimiter(max_calls=3, time_window=1.0)
+
+        assert [limiter.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_waiters_are_spaced_out(self, clock):
+        """Each call beyond the burst waits one more refill interval than the last"""
+        limiter = RateLimiter(max_calls=2, time_window=1.0)
+        limiter.acquire()
+        limiter.acquire()
+
+        assert limiter.acquire() == pytest.approx(0.5)
+        assert limiter.acquire() == pytest.approx(1.0)
+        assert limiter.acquire() == pytest.approx(1.5)
+
+    def test_bucket_refills_over_time(self, clock):
+        """Elapsed time pays back tokens at max_calls per time_window"""
+        limiter = RateLimiter(max_calls=2, time_window=1.0)
+        for _ in range(4):
+            limiter.acquire()  # bucket at -2
+
+        clock.advance(1.0)  # +2 tokens
+        assert limiter.acquire() == pytest.approx(0.5)
+
+    def test_refill_is_capped_at_max_calls(self, clock):
+        """A long idle period does not bank more than one burst"""
+        limiter = RateLimiter(max_calls=2, time_window=1.0)
+        clock.advance(60.0)
+
+        assert [limiter.acquire() for _ in range(2)] == [0.0, 0.0]
+        assert limiter.acquire() == pytest.approx(0.5)
+
+    def test_zero_window_never_waits(self, clock):
+        """time_window=0 disables limiting"""
+        limiter = RateLimiter(max_calls=1, time_window=0)
+
+        assert [limiter.acquire() for _ in range(5)] == [0.0] * 5
+
+    def test_wait_if_needed_sleeps_for_the_wait(self, clock, monkeypatch):
+        """Only a call over the limit sleeps, and for acquire()'s wait time"""
+        slept = []
+
+        async def fake_sleep(seconds):
+            slept.append(seconds)
+
+        monkeypatch.setattr(parallel_processor.asyncio, "sleep", fake_sleep)
+        limiter = RateLimiter(max_calls=1, time_window=2.0)
+
+        async def two_calls():
+            await limiter.wait_if_needed()
+            await limiter.wait_if_needed()
+
+        asyncio.run(two_calls())
+        assert slept == [pytest.approx(2.0)]
@@ -3,22 +3,175 @@ Enhanced Streamlit UI with intelligent entry point discovery
 """
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import atexit
 import zipfile
+import hashlib
 import os
 import shutil
 import tempfile
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional
 from dotenv import load_dotenv
 
 # Import the entry point discovery
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
-import repo_upgrader
 from entrypoint_discovery import EntryPointDiscovery, EntryPoint
+from import_scanner import RepoScanner
+from utils import ZipRepoReader
 
 load_dotenv()
 
 
+# Already-compressed formats gain nothing from DEFLATE; they are stored as-is
+_STORED_SUFFIXES = (
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.whl', '.jar',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp3', '.mp4',
+    '.npz', '.pt', '.pth', '.h5',
+)
+
+# Confidence bars for 0..10 filled cells, built once instead of on every rerun
+_CONFIDENCE_BARS = tuple("🟩" * filled + "⬜" * (10 - filled) for filled in range(11))
+
+# Non-entry selectbox options, alongside the indices of the discovered entries
+_CUSTOM_COMMAND = "custom"
+_SKIP_VALIDATION = "skip"
+
+
+def _is_bytecode(member: str) -> bool:
+    """True for compiled-bytecode zip members (.pyc files and __pycache__ contents)"""
+    return member.endswith('.pyc') or '__pycache__/' in member
+
+
+def _zip_tree(src_dir: str, zip_path: str) -> None:
+    """Zip src_dir like shutil.make_archive, but with fast DEFLATE and no recompression"""
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for root, dirs, files in os.walk(src_dir):
+            for name in sorted(dirs):
+                zf.write(os.path.join(root, name), os.path.relpath(os.path.join(root, name), src_dir))
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                if not os.path.isfile(full):  # e.g. a dangling symlink
+                    continue
+                compress_type = zipfile.ZIP_STORED if name.lower().endswith(_STORED_SUFFIXES) else None
+                zf.write(full, os.path.relpath(full, src_dir), compress_type=compress_type)
+
+
+def _upload_hash(uploaded_file) -> str:
+    """SHA-256 of the uploaded zip, hashed once per upload rather than on every rerun"""
+    cached = st.session_state.get("upload_hash")
+    if cached is not None and cached[0] == uploaded_file.file_id:
+        return cached[1]
+    repo_hash = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    st.session_state["upload_hash"] = (uploaded_file.file_id, repo_hash)
+    return repo_hash
+
+
+def _remove_workspaces(workspaces: set) -> None:
+    for temp_dir in list(workspaces):
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+@st.cache_resource
+def _live_workspaces() -> set:
+    """Extracted uploads of every session, removed by a single exit hook
+
+    Cached as a resource because main() and this module re-run on every
+    interaction; sessions may never upload again, so nothing else deletes them.
+    """
+    workspaces: set = set()
+    atexit.register(_remove_workspaces, workspaces)
+    return workspaces
+
+
+def _remove_workspace(workspaces: set, temp_dir: str) -> None:
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    workspaces.discard(temp_dir)
+
+
+def _session_workspace(repo_hash: str) -> str:
+    """Temp dir holding this session's extracted upload, reused until a different zip arrives"""
+    workspace = st.session_state.get("workspace")
+    if workspace is not None and workspace[0] == repo_hash and os.path.isdir(workspace[1]):
+        return workspace[1]
+    _discard_workspace()
+    temp_dir = tempfile.mkdtemp()
+    _live_workspaces().add(temp_dir)
+    st.session_state["workspace"] = (repo_hash, temp_dir)
+    return temp_dir
+
+
+def _discard_workspace() -> None:
+    """Delete the session's extracted upload, if any
+
+    If an upgrade is still writing into it, deletion waits for that job to finish.
+    """
+    workspace = st.session_state.pop("workspace", None)
+    if workspace is None:
+        return
+    workspaces = _live_workspaces()
+    upgrade_job = st.session_state.get("upgrade_job")
+    if upgrade_job is not None and upgrade_job[0] == workspace[0] and not upgrade_job[1].done():
+        upgrade_job[1].add_done_callback(lambda _: _remove_workspace(workspaces, workspace[1]))
+    else:
+        _remove_workspace(workspaces, workspace[1])
+
+
+def _run_upgrade(old_repo_path: str, new_repo_path: str, output_zip: str, model: str,
+                 runtime_config_payload: Optional[dict], progress: dict) -> str:
+    """Upgrade and zip the repository off the script thread; returns the report path
+
+    progress["done"] / progress["total"] are updated as files finish, for the
+    script thread to poll. The job outlives an interrupted script run, so the
+    environment it needs is set and restored here rather than by the caller.
+    """
+    # Imported on first use: the upgrade pipeline is the bulk of the
+    # app's import time and most page renders never reach this point
+    import repo_upgrader
+    
+    os.environ["ML_UPGRADER_MODEL"] = model
+    
+    # Pass the runtime config inline; no temp file to write and clean up
+    previous_runtime_config_json = os.getenv("ML_UPGRADER_RUNTIME_CONFIG_JSON")
+    try:
+        if runtime_config_payload is not None:
+            os.environ["ML_UPGRADER_RUNTIME_CONFIG_JSON"] = json.dumps(
+                runtime_config_payload, separators=(",", ":"))
+        
+        report_path = repo_upgrader.upgrade_repo(
+            old_repo_path, new_repo_path,
+            progress_callback=lambda done, total: progress.update(done=done, total=total))
+    finally:
+        if previous_runtime_config_json is not None:
+            os.environ["ML_UPGRADER_RUNTIME_CONFIG_JSON"] = previous_runtime_config_json
+        elif runtime_config_payload is not None:
+            os.environ.pop("ML_UPGRADER_RUNTIME_CONFIG_JSON", None)
+    
+    # Create downloadable zip
+    _zip_tree(new_repo_path, output_zip)
+    return report_path
+
+
+@st.cache_data(show_spinner=False)
+def _cached_discover(repo_hash: str, _repo_path: str, _scanner: RepoScanner) -> list[EntryPoint]:
+    """Top entry points of the uploaded repository, computed once per upload
+
+    Streamlit reruns main() on every widget interaction; keyed on the zip's
+    hash, the walk and README parsing only happen for a new upload. _repo_path
+    and _scanner are not hashed: the entries depend on the zip's contents, not
+    on which session's workspace it was extracted into.
+    """
+    return EntryPointDiscovery(_repo_path, scanner=_scanner).discover_all(top=10)  # only the top 10 are shown
+
+
+def _discover_in_background(ctx, repo_hash: str, repo_path: str, scanner: RepoScanner) -> list[EntryPoint]:
+    """_cached_discover for a pool thread, which needs the script run's context for st.cache_data"""
+    add_script_run_ctx(ctx=ctx)
+    return _cached_discover(repo_hash, repo_path, scanner)
+
+
 def display_discovered_entries(entries: list[EntryPoint]) -> str:
     """Display discovered entry points in Streamlit and get user selection"""
     
@@ -34,41 +187,43 @@ def display_discovered_entries(entries: list[EntryPoint]) -> str:
     st.subheader("🔍 Discovered Entry Points")
     st.markdown("Select a command to run for runtime validation after upgrade:")
     
-    # Create a formatted display
-    options = []
-    for entry in entries[:10]:  # Show top 10
-        confidence_pct = int(entry.confidence * 100)
-        label = f"{entry.command} ({confidence_pct}% confidence)"
-        options.append(label)
+    # Options are entry indices plus two sentinels; labels are only built for display
+    shown = entries[:10]  # Show top 10
+    options = [*range(len(shown)), _CUSTOM_COMMAND, _SKIP_VALIDATION]
     
-    # Add custom option
-    options.append("🔧 Enter custom command")
-    options.append("⏭️  Skip runtime validation")
+    def format_option(option) -> str:
+        if option == _CUSTOM_COMMAND:
+            return "🔧 Enter custom command"
+        if option == _SKIP_VALIDATION:
+            return "⏭️  Skip runtime validation"
+        entry = shown[option]
+        return f"{entry.command} ({int(entry.confidence * 100)}% confidence)"
     
     # Show entries in an expander with details
     with st.expander("📋 View all discovered entry points", expanded=True):
-        for i, entry in enumerate(entries[:10], 1):
-            confidence_bar = "🟩" * int(entry.confidence * 10) + "⬜" * (10 - int(entry.confidence * 10))
+        for i, entry in enumerate(shown, 1):
+            confidence_bar = _CONFIDENCE_BARS[min(10, int(entry.confidence * 10))]
             
             col1, col2 = st.columns([3, 1])
             with col1:
                 st.markdown(f"**{i}. `{entry.command}`**")
                 st.caption(f"{entry.description}")
             with col2:
-                st.markdown(f"{confidence_bar}")
+                st.markdown(confidence_bar)
                 st.caption(f"Type: {entry.type}")
     
     # Selection dropdown
     selected = st.selectbox(
         "Choose an entry point:",
         options,
+        format_func=format_option,
         help="The selected command will run after each file upgrade to validate it works"
     )
     
     # Handle selection
-    if selected == "⏭️  Skip runtime validation":
+    if selected == _SKIP_VALIDATION:
         return None
-    elif selected == "🔧 Enter custom command":
+    elif selected == _CUSTOM_COMMAND:
         custom_command = st.text_input(
             "Enter custom command:",
             placeholder="python train.py --epochs 1",
@@ -76,9 +231,7 @@ def display_discovered_entries(entries: list[EntryPoint]) -> str:
         )
         return custom_command
     else:
-        # Extract command from label (remove confidence percentage)
-        command = selected.split(" (")[0]
-        return command
+        return shown[selected].command
 
 
 def main():
@@ -157,36 +310,50 @@ def main():
             st.error("❌ Please set an OpenRouter API key in the sidebar or .env before running an upgrade.")
             return
 
+        if not uploaded_file:
+            _discard_workspace()
+            st.session_state.pop("upload_hash", None)
+            st.session_state.pop("upgrade_job", None)
+
         if uploaded_file and os.getenv("OPENROUTER_API_KEY"):
-            # Create temp directories
-            temp_dir = tempfile.mkdtemp()
+            # The extraction is kept across reruns until a different zip is uploaded
+            repo_hash = _upload_hash(uploaded_file)
+            temp_dir = _session_workspace(repo_hash)
             old_repo_path = os.path.join(temp_dir, "old_repo")
             new_repo_path = os.path.join(temp_dir, "new_repo")
             
             try:
-                # Extract uploaded zip
-                zip_path = os.path.join(temp_dir, "uploaded.zip")
-                with open(zip_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                
-                with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                    zip_ref.extractall(old_repo_path)
+                if not os.path.isdir(old_repo_path):
+                    # Extract uploaded zip
+                    zip_path = os.path.join(temp_dir, "uploaded.zip")
+                    with open(zip_path, "wb") as f:
+                        f.write(uploaded_file.getbuffer())
+                    
+                    # Streamed member by member with 1 MiB copies; bytecode caches are
+                    # never read by the upgrader and are regenerated on import anyway
+                    ZipRepoReader(zip_path).extract_to(old_repo_path, skip=_is_bytecode)
                 
                 st.success("✅ Repository uploaded and extracted")
                 
+                # One scandir-based walk (directories read concurrently on wide trees),
+                # shared by the structure preview and entry point discovery
+                scanner = RepoScanner(old_repo_path, max_workers=8)
+                scanner.walk()
+                
+                # Discover entry points in the background while the structure preview renders
+                discovery_pool = ThreadPoolExecutor(max_workers=1)
+                discovery_future = discovery_pool.submit(
+                    _discover_in_background, get_script_run_ctx(), repo_hash, old_repo_path, scanner)
+                discovery_pool.shutdown(wait=False)  # the worker exits once discovery is done
+                
                 # Show repository structure
                 st.subheader("📂 Repository Structure")
-                python_files = []
-                for root, dirs, files in os.walk(old_repo_path):
-                    for file in files:
-                        if file.endswith('.py'):
-                            rel_path = os.path.relpath(os.path.join(root, file), old_repo_path)
-                            python_files.append(rel_path)
+                python_files = list(scanner.python_files())
                 
                 st.write(f"Found **{len(python_files)}** Python files:")
                 with st.expander("View files"):
-                    for file in python_files[:10]:
-                        st.text(f"📄 {file}")
+                    for file in python_files[:10]:  # only the shown paths are made relative
+                        st.text(f"📄 {os.path.relpath(file, old_repo_path)}")
                     if len(python_files) > 10:
                         st.text(f"... and {len(python_files) - 10} more files")
                 
@@ -195,8 +362,7 @@ def main():
                 st.subheader("🎯 Runtime Validation Setup")
                 
                 with st.spinner("🔍 Discovering entry points..."):
-                    discovery = EntryPointDiscovery(old_repo_path)
-                    discovered_entries = discovery.discover_all()
+                    discovered_entries = discovery_future.result()
                 
                 # Get user's choice
                 selected_command = display_discovered_entries(discovered_entries)
@@ -207,22 +373,43 @@ def main():
                 else:
                     st.info("⏭️  Runtime validation disabled")
                 
+                # A running upgrade lives in session state: reruns (e.g. another click)
+                # attach to it instead of starting the whole pipeline again
+                upgrade_job = st.session_state.get("upgrade_job")
+                if upgrade_job is not None and upgrade_job[0] != repo_hash:
+                    upgrade_job = None  # belongs to a previous upload
+                upgrade_running = upgrade_job is not None and not upgrade_job[1].done()
+                output_zip = os.path.join(temp_dir, "upgraded_repo.zip")
+                
                 # Upgrade button
-                if st.button("🚀 Start Upgrade", type="primary", use_container_width=True):
+                start_clicked = st.button("🚀 Start Upgrade", type="primary", use_container_width=True,
+                                          disabled=upgrade_running)
+                if start_clicked or upgrade_job is not None:
                     
-                    # Build runtime configuration
-                    runtime_config_payload = None
-                    if selected_command:
-                        # Parse command (could be string or need to be split)
-                        runtime_config_payload = {
-                            "command": selected_command,
-                            "timeout": runtime_timeout,
-                            "skip_install": False,
-                            "force_reinstall": False,
-                            "shell": True if any(op in selected_command for op in ['&&', '||', '|', '>', '<']) else False,
-                            "max_log_chars": 6000,
-                            "env": {},
-                        }
+                    if upgrade_job is None:
+                        # Build runtime configuration
+                        runtime_config_payload = None
+                        if selected_command:
+                            # Parse command (could be string or need to be split)
+                            runtime_config_payload = {
+                                "command": selected_command,
+                                "timeout": runtime_timeout,
+                                "skip_install": False,
+                                "force_reinstall": False,
+                                "shell": True if any(op in selected_command for op in ['&&', '||', '|', '>', '<']) else False,
+                                "max_log_chars": 6000,
+                                "env": {},
+                            }
+                        
+                        progress = {"done": 0, "total": 0}
+                        upgrade_pool = ThreadPoolExecutor(max_workers=1)
+                        upgrade_future = upgrade_pool.submit(
+                            _run_upgrade, old_repo_path, new_repo_path, output_zip,
+                            model, runtime_config_payload, progress)
+                        upgrade_pool.shutdown(wait=False)  # the worker exits once the upgrade is done
+                        upgrade_job = (repo_hash, upgrade_future, progress)
+                        st.session_state["upgrade_job"] = upgrade_job
+                    _, upgrade_future, progress = upgrade_job
                     
                     with st.spinner("🔄 Upgrading repository... This may take a few minutes."):
                         
@@ -234,42 +421,16 @@ def main():
                         status_text.text("📦 Updating dependencies...")
                         progress_bar.progress(10)
                         
+                        # Redraw at most twice a second, however quickly files finish
+                        while upgrade_future not in wait([upgrade_future], timeout=0.5).done:
+                            done, total = progress["done"], progress["total"]
+                            if total:
+                                status_text.text(f"🔄 Upgrading Python files... {done}/{total}")
+                                progress_bar.progress(30 + 60 * done // total)
+                        st.session_state.pop("upgrade_job", None)
+                        
                         try:
-                            # Set model
-                            os.environ["ML_UPGRADER_MODEL"] = model
-
-                            # Write runtime config if provided
-                            runtime_config_path = None
-                            previous_runtime_config_env = os.getenv("ML_UPGRADER_RUNTIME_CONFIG")
-                            try:
-                                if runtime_config_payload is not None:
-                                    runtime_temp = tempfile.NamedTemporaryFile("w", delete=False, suffix=".json")
-                                    json.dump(runtime_config_payload, runtime_temp, indent=2)
-                                    runtime_temp.flush()
-                                    runtime_temp.close()
-                                    runtime_config_path = runtime_temp.name
-                                    os.environ["ML_UPGRADER_RUNTIME_CONFIG"] = runtime_config_path
-
-                                status_text.text("🔄 Upgrading Python files...")
-                                progress_bar.progress(30)
-                                
-                                report_path = repo_upgrader.upgrade_repo(old_repo_path, new_repo_path)
-                                
-                            finally:
-                                if runtime_config_path and os.path.exists(runtime_config_path):
-                                    os.unlink(runtime_config_path)
-                                if previous_runtime_config_env is not None:
-                                    os.environ["ML_UPGRADER_RUNTIME_CONFIG"] = previous_runtime_config_env
-                                elif runtime_config_payload is not None:
-                                    os.environ.pop("ML_UPGRADER_RUNTIME_CONFIG", None)
-
-                            progress_bar.progress(90)
-                            
-                            status_text.text("📄 Generating report...")
-                            
-                            # Create downloadable zip
-                            output_zip = os.path.join(temp_dir, "upgraded_repo.zip")
-                            shutil.make_archive(output_zip[:-4], 'zip', new_repo_path)
+                            report_path = upgrade_future.result()
                             
                             progress_bar.progress(100)
                             status_text.text("✅ Upgrade complete!")
@@ -289,7 +450,7 @@ def main():
                         
                         # Show upgrade report
                         if os.path.exists(report_path):
-                            with open(report_path, 'r') as f:
+                            with open(report_path, 'r', encoding='utf-8') as f:
                                 report_content = f.read()
                             
                             # Extract summary stats
@@ -330,7 +491,7 @@ def main():
                         
                         # Download report only
                         if os.path.exists(report_path):
-                            with open(report_path, "r") as f:
+                            with open(report_path, "r", encoding="utf-8") as f:
                                 st.download_button(
                                     "📄 Download Upgrade Report",
                                     f.read(),
@@ -344,11 +505,8 @@ def main():
                 import traceback
                 with st.expander("🐛 Debug info"):
                     st.code(traceback.format_exc())
-            
-            finally:
-                # Cleanup
-                if os.path.exists(temp_dir):
-                    shutil.rmtree(temp_dir)
+                # Start from a fresh extraction on the next rerun
+                _discard_workspace()
 
     # Footer
     st.markdown("---")